@@ -0,0 +1,197 @@
+import os
+import glob
+import json
+import argparse
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from brd_parser import PCBSummary, read_board, get_board_dimensions, count_board_layers, ComponentCounter
+from die_size import estimate_die_area, split_package_area
+from inventory_cache import InventoryCache
+from enrichment import LocalProvider, DigikeyProvider, MetadataCache, TokenBucket, enrich_summaries
+
+# ComponentCounter category -> key of the passive counts in the design summary
+PASSIVE_CATEGORIES = {"Resistor": "resistor", "Capacitor": "capacitor", "Inductor": "inductor"}
+# ComponentCounter categories that end up in the "IC" section of the design summary
+IC_CATEGORIES = ["Transistor", "OpAmp", "Processor", "Sensor", "Crystal", "Connector", "Other_Parts"]
+# element values of parts that are not placed on the board (frames, fiducials, unpopulated footprints, ...)
+NOT_POPULATED_VALUES = {"", "-", "DNP"}
+# the design summary does not use the component adjacency, so large nets are left out of it
+MAX_FANOUT = 64
+
+def passive_size(package_name):
+    """
+    Size code of a passive package, e.g. "0402" for "0402-1005X55N".
+
+    Parameters:
+    - package_name: The digits of the package name, as counted by ComponentCounter.
+
+    Returns:
+    The first four digits (the imperial size code for the usual package names), or "01005" for the only
+    5-digit imperial size.
+    """
+    if package_name.startswith("01005"):
+        return "01005"
+    return package_name[:4]
+
+def to_design_summary(components, element_values):
+    """
+    Converts the output of ComponentCounter into the design summary read by utils.load_design.
+
+    Parameters:
+    - components: The dictionary built by parse_brd_pcb (board summary plus the component categories).
+    - element_values: Maps element names to their value (the part name, e.g. "ATMEGA4809").
+
+    Returns:
+    A dictionary with "board", "resistor", "capacitor", "inductor" and "IC" entries.
+    """
+    summary = {"board": components["board"]}
+    for category, key in PASSIVE_CATEGORIES.items():
+        sizes = {}
+        for entry in components[category]:
+            size = passive_size(entry["Package"])
+            if size:
+                sizes[size] = sizes.get(size, 0) + entry["Count"]
+        summary[key] = sizes
+
+    ics = {}
+    for category in IC_CATEGORIES:
+        for component in components[category]:
+            name = element_values.get(component["Component"], "").strip()
+            if name in NOT_POPULATED_VALUES:
+                continue
+            if name in ics:
+                ics[name]["Count"] += component["Count"]
+                continue
+            ic = {
+                "Name": name,
+                "Package": component["Package"],
+                "Memory_Size": component.get("Memory_Size") or None,
+                "GPIO_Count": component.get("GPIO_Count") or None,
+                "Power_Consumption": component.get("Power_Consumption", ""),
+                "Process_Node": component.get("Process_Node", ""),
+                "Count": component["Count"],
+            }
+            # package dimensions and die size are only known once the part metadata has been looked up
+            package = split_package_area(component["Package_Area"]) if component.get("Package_Area") else None
+            if package is not None:
+                ic["Package_Type"], ic["Package_Area"] = package
+                ic["Die_Size"] = estimate_die_area(component["Package_Area"])
+            ics[name] = ic
+    summary["IC"] = ics
+    return summary
+
+def generate_inventory(brd_file_path):
+    """
+    Parses and classifies one .brd file.
+
+    Parameters:
+    - brd_file_path: Path to the .brd file.
+
+    Returns:
+    The design summary in the schema of utils.load_design.
+    """
+    board = read_board(brd_file_path)
+    length, width = get_board_dimensions(board)
+    components = {"board": PCBSummary(length, width, count_board_layers(board)).to_dict()}
+
+    counter = ComponentCounter(board, max_fanout=MAX_FANOUT)
+    for element in board.elements:
+        counter.add_component(element)
+    components.update(counter.get_components())
+
+    element_values = {element.get('name', ''): element.get('value', '') for element in board.elements}
+    return to_design_summary(components, element_values)
+
+def _inventory_job(brd_file_path, cache_dir=None, cache_max_bytes=None):
+    start_time = perf_counter()
+    if cache_dir is not None:
+        summary, hit = InventoryCache(cache_dir, cache_max_bytes).get_or_generate(brd_file_path, generate_inventory)
+    else:
+        summary, hit = generate_inventory(brd_file_path), False
+    return summary, perf_counter() - start_time, hit
+
+def batch_inventory(brd_file_paths, output_folder, max_workers=None, cache=None, enrich=None):
+    """
+    Generates the design summaries of several boards in parallel worker processes.
+
+    Parameters:
+    - brd_file_paths: Paths to the .brd files.
+    - output_folder: Folder receiving one <board name>.json per board.
+    - max_workers: Number of worker processes (defaults to the number of CPUs).
+    - cache: Optional InventoryCache; unchanged boards are then read from it instead of being parsed again,
+      its stats are updated and it is trimmed to its size bound at the end.
+    - enrich: Optional function filling in the part metadata of the summaries (e.g. a partial of
+      enrichment.enrich_summaries); it is called once in this process with all summaries, so that each part is
+      looked up once for the whole batch.
+
+    Returns:
+    A list of (brd_file_path, output_path, seconds, cached, error) in the order of brd_file_paths;
+    output_path is None and error holds the message for boards that could not be processed.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    cache_args = (cache.cache_dir, cache.max_bytes) if cache is not None else ()
+    results = {}
+    summaries = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_inventory_job, path, *cache_args): path for path in brd_file_paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                summaries[path], seconds, hit = future.result()
+                results[path] = (path, None, seconds, hit, None)
+                if cache is not None:
+                    cache.stats["hits" if hit else "misses"] += 1
+            except Exception as e:
+                results[path] = (path, None, None, False, f"{type(e).__name__}: {e}")
+    if cache is not None:
+        cache.evict()
+    if enrich is not None and summaries:
+        enrich(list(summaries.values()))
+
+    for path, summary in summaries.items():
+        output_path = os.path.join(output_folder, os.path.splitext(os.path.basename(path))[0] + ".json")
+        with open(output_path, 'w', encoding='utf-8') as file:
+            json.dump(summary, file, ensure_ascii=False, indent=4)
+        _, _, seconds, hit, _ = results[path]
+        results[path] = (path, output_path, seconds, hit, None)
+    return [results[path] for path in brd_file_paths]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate partial inventories for a set of .brd files')
+    parser.add_argument('patterns', nargs='+', help="glob patterns of .brd files, e.g. 'toy_pcb_design_files/*.brd'")
+    parser.add_argument('--output_folder', type=str, default="inventories")
+    parser.add_argument('--max_workers', type=int, default=None)
+    parser.add_argument('--cache_dir', type=str, default=None, help="reuse inventories of unchanged boards from this folder")
+    parser.add_argument('--cache_max_mb', type=float, default=256)
+    parser.add_argument('--metadata', type=str, nargs='+', default=None,
+                        help="fill in part metadata from local .json/.sqlite files (see enrichment.LocalProvider)")
+    parser.add_argument('--digikey', action='store_true', help="fill in part metadata with the Digikey API")
+    parser.add_argument('--metadata_cache', type=str, default="part_metadata.sqlite")
+    parser.add_argument('--rate', type=float, default=2.0, help="maximum metadata requests per second")
+    parser.add_argument('--lookup_workers', type=int, default=8)
+    args = parser.parse_args()
+    cache = InventoryCache(args.cache_dir, int(args.cache_max_mb * 1024 * 1024)) if args.cache_dir else None
+
+    enrich = None
+    if args.metadata or args.digikey:
+        provider = DigikeyProvider() if args.digikey else LocalProvider(*args.metadata)
+        metadata_cache = MetadataCache(args.metadata_cache) if args.digikey else None
+        rate_limiter = TokenBucket(args.rate) if args.digikey else None
+        def enrich(summaries):
+            stats = enrich_summaries(summaries, provider, metadata_cache, args.lookup_workers, rate_limiter)
+            print(f"Part metadata: {stats['parts']} parts, {stats['cache_hits']} cached, {stats['requests']} requests, "
+                  f"{stats['not_found']} not found, {stats['errors']} errors")
+
+    brd_file_paths = sorted(set(path for pattern in args.patterns for path in glob.glob(pattern, recursive=True)))
+    if not brd_file_paths:
+        print("No .brd files found")
+    start_time = perf_counter()
+    for path, output_path, seconds, cached, error in batch_inventory(brd_file_paths, args.output_folder, args.max_workers, cache, enrich):
+        if error is None:
+            print(f"{path} -> {output_path} ({seconds*1e3:.1f} ms{', cached' if cached else ''})")
+        else:
+            print(f"{path} failed: {error}")
+    print(f"{len(brd_file_paths)} boards in {perf_counter() - start_time:.2f} seconds")
+    if cache is not None:
+        print(cache.report())
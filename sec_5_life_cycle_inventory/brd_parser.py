@@ -0,0 +1,627 @@
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import scipy.sparse as sp
+
+from component_rules import default_rules, designator
+
+# Bump when a change to the parsing or classification changes the generated inventories (invalidates inventory_cache)
+PARSER_VERSION = "1"
+
+class PCBSummary:
+    """
+    Class to store and retrieve PCB summary information like dimensions and layer count.
+    """
+    def __init__(self, length=0, width=0, num_layers=0):
+        """
+        Initialize PCB summary with dimensions and layer count.
+
+        Parameters:
+        - length: The length of the PCB in mm
+        - width: The width of the PCB in mm
+        - num_layers: The number of layers in the PCB
+        """
+        self.length = length
+        self.width = width
+        self.num_layers = num_layers
+
+    def to_dict(self):
+        """
+        Convert PCB summary to dictionary.
+
+        Returns:
+        - Dictionary with PCB summary information
+        """
+        return {
+            "Size": {
+                "Length": self.length,
+                "Width": self.width,},
+            "Number_of_Layers": self.num_layers,
+        }
+
+class BoardData:
+    """
+    Everything the inventory needs from a .brd file, collected in a single streaming pass by read_board.
+    """
+    def __init__(self):
+        """
+        Initialize empty board data.
+
+        Attributes:
+        - layers: (number, name) of each layer, in file order
+        - plain_wires: attributes of the wires in board/plain (the board outline)
+        - plain_rectangles: attributes of the rectangles in board/plain
+        - libraries: (library name, [(package name, number of SMD pads)]) in file order
+        - elements: the element XML elements (with their attribute children), detached from the tree
+        - signals: (signal name, [(element name, pad)]) in file order
+        """
+        self.layers = []
+        self.plain_wires = []
+        self.plain_rectangles = []
+        self.libraries = []
+        self.elements = []
+        self.signals = []
+
+def read_board(brd_file_path):
+    """
+    Reads a .brd PCB design file with one iterparse sweep. Elements are cleared as soon as their content has been
+    collected, so memory stays proportional to the collected data instead of the whole XML tree.
+
+    Parameters:
+    - brd_file_path: Path to the .brd file.
+
+    Returns:
+    A BoardData object.
+    """
+    board = BoardData()
+    path = []  # open XML elements, from the root to the current one
+    library_name = None
+    library_packages = None
+    package_smd_count = 0
+    signal_contactrefs = None
+    for event, elem in ET.iterparse(brd_file_path, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            path.append(elem)
+            if tag == "library":
+                library_name = elem.get("name", "")
+                library_packages = []
+            elif tag == "package":
+                package_smd_count = 0
+            elif tag == "signal":
+                signal_contactrefs = []
+            continue
+
+        path.pop()
+        parent = path[-1].tag if path else None
+        if tag == "layer" and parent == "layers":
+            board.layers.append((elem.get("number", ""), elem.get("name", "")))
+        elif parent == "plain" and len(path) >= 2 and path[-2].tag == "board":
+            if tag == "wire":
+                board.plain_wires.append(dict(elem.attrib))
+            elif tag == "rectangle":
+                board.plain_rectangles.append(dict(elem.attrib))
+        elif tag == "smd" and library_packages is not None:
+            package_smd_count += 1
+        elif tag == "package" and parent == "packages" and library_packages is not None:
+            library_packages.append((elem.get("name", ""), package_smd_count))
+            elem.clear()
+        elif tag == "library":
+            board.libraries.append((library_name, library_packages))
+            library_packages = None
+            elem.clear()
+        elif tag == "element" and parent == "elements":
+            # kept (it is small) and detached from the tree when the elements section is cleared
+            board.elements.append(elem)
+        elif tag == "contactref" and signal_contactrefs is not None:
+            signal_contactrefs.append((elem.get("element", ""), elem.get("pad", "")))
+        elif tag == "signal" and parent == "signals":
+            board.signals.append((elem.get("name", ""), signal_contactrefs))
+            signal_contactrefs = None
+            elem.clear()
+        elif tag in ("plain", "libraries", "elements", "signals"):
+            elem.clear()
+    return board
+
+def get_board_dimensions(board):
+    """
+    Calculate the dimensions of the PCB by analyzing the board outline (wire elements in the plain section).
+
+    Parameters:
+    - board: The BoardData of the PCB design.
+
+    Returns:
+    - tuple: (length, width) representing the PCB dimensions in millimeters.
+    """
+    plain_wires = board.plain_wires
+
+    # If no board outline is found, use the first rectangle as the board outline
+    if not plain_wires:
+        if board.plain_rectangles:
+            rectangle = board.plain_rectangles[0]
+            try:
+                x1 = float(rectangle.get("x1", 0))
+                y1 = float(rectangle.get("y1", 0))
+                x2 = float(rectangle.get("x2", 0))
+                y2 = float(rectangle.get("y2", 0))
+                return abs(x2 - x1), abs(y2 - y1)
+            except (ValueError, TypeError):
+                # Handle case where coordinates aren't numbers
+                return 0, 0
+        return 0, 0
+
+    # Extract coordinates from all wire elements
+    plain_coordinates = []
+    for wire in plain_wires:
+        try:
+            x1 = float(wire.get("x1", 0))
+            y1 = float(wire.get("y1", 0))
+            x2 = float(wire.get("x2", 0))
+            y2 = float(wire.get("y2", 0))
+            plain_coordinates.append((x1, y1, x2, y2))
+        except (ValueError, TypeError):
+            # Skip wires with invalid coordinates
+            continue
+
+    # If no valid coordinates were found
+    if not plain_coordinates:
+        return 0, 0
+
+    # Find the minimum and maximum coordinates to determine the board dimensions
+    min_x = min(min(coord[0], coord[2]) for coord in plain_coordinates)
+    min_y = min(min(coord[1], coord[3]) for coord in plain_coordinates)
+    max_x = max(max(coord[0], coord[2]) for coord in plain_coordinates)
+    max_y = max(max(coord[1], coord[3]) for coord in plain_coordinates)
+
+    return abs(max_x - min_x), abs(max_y - min_y)
+
+def count_board_layers(board):
+    """
+    Count the number of copper layers in the PCB design.
+
+    Parameters:
+    - board: The BoardData of the PCB design.
+
+    Returns:
+    - int: The number of copper layers (signal layers) in the PCB.
+    """
+    # EAGLE PCB typically uses layer numbers 1-16 for copper layers
+    # Layer 1 is Top, Layer 16 is Bottom for a 2-layer board
+    # In multi-layer boards, intermediate layers are numbered 2-15
+    start_counting = False
+    num_layer = 0
+    for _, name in board.layers:
+        if name == "Top":
+            start_counting = True
+            num_layer += 1
+        elif name == "Bottom":
+            num_layer += 1
+            break
+        elif start_counting:
+            num_layer += 1
+
+    return max(num_layer, 1)  # Return at least 1 layer
+
+# Signals whose components are reported as power supply components
+POWER_SIGNALS = ['VDD', 'VCC', '3V3', '5V']
+
+class ComponentCounter:
+    def __init__(self, board, rules=None, max_fanout=None):
+        """
+        Initializes the component counter with dictionaries for various component types and stores the board data.
+
+        Parameters:
+        - board: The BoardData of the PCB design.
+        - rules: The component_rules.RuleTable used to classify components (defaults to classification_rules.json).
+        - max_fanout: Signals connecting more components than this (GND and supply nets on dense boards) do not
+          make their components connected to each other. None keeps all signals.
+        """
+        self.resistor = {}
+        self.capacitor = {}
+        self.inductor = {}
+        self.transistor = {}
+        self.OpAmp = {}
+        self.processor = {}
+        self.sensor = {}
+        self.crystal = {}
+        self.connector = {}
+        self.otherPart = {}
+        self.board = board
+        self.rules = rules if rules is not None else default_rules()
+
+        self.max_fanout = max_fanout
+
+        # Lookup tables, built once so that per-component lookups do not scan the board
+        # (the first element / library / package with a given name wins, as with a search in file order)
+        self.elements_by_name = {}  # Maps element names to elements
+        for element in board.elements:
+            self.elements_by_name.setdefault(element.get('name'), element)
+        self.library_packages = {}  # Maps library names to {package name: number of SMD pads}
+        for library_name, packages in board.libraries:
+            if library_name not in self.library_packages:
+                smd_counts = {}
+                for package_name, smd_count in packages:
+                    smd_counts.setdefault(package_name, smd_count)
+                self.library_packages[library_name] = smd_counts
+
+        # Parse connectivity data
+        self._parse_signals()
+
+    def _parse_signals(self):
+        """
+        Build connectivity data from the signals of the board.
+        This helps in understanding component correlation.
+
+        The connectivity is kept as a sparse component x signal incidence matrix (CSR, plus its CSC transpose for
+        signal -> components), from which pin counts, bus membership and component adjacency are derived.
+        """
+        self.component_index = {}  # Maps component names to incidence matrix rows, in order of appearance
+        self.signal_names = []  # Signal name of each incidence matrix column
+        rows, columns, pads = [], [], []
+        pad_index = {}
+        for signal_name, contactrefs in self.board.signals:
+            column = len(self.signal_names)
+            self.signal_names.append(signal_name)
+            for component_name, pad in contactrefs:
+                # Skip empty references
+                if not component_name:
+                    continue
+                rows.append(self.component_index.setdefault(component_name, len(self.component_index)))
+                columns.append(column)
+                pads.append(pad_index.setdefault(pad, len(pad_index)))
+        self.component_names = list(self.component_index)
+
+        n_components, n_signals = len(self.component_names), len(self.signal_names)
+        rows = np.array(rows, dtype=np.int64)
+        columns = np.array(columns, dtype=np.int64)
+        self.incidence = sp.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)),
+                                       shape=(n_components, n_signals))
+        self.incidence.data[:] = 1  # a component touching a signal with several pads still counts once
+        self.signal_members = self.incidence.tocsc()
+
+        # Track pin counts: the number of distinct pads of each component
+        contacts = np.unique(rows * max(len(pad_index), 1) + np.array(pads, dtype=np.int64))
+        self.pin_counts = np.bincount(contacts // max(len(pad_index), 1), minlength=n_components)
+
+        # Component adjacency through the signals that connect components with each other (all of them unless
+        # max_fanout is set; a net with k components adds k^2 entries)
+        fanout = np.diff(self.signal_members.indptr)
+        connecting = self.incidence if self.max_fanout is None else self.incidence[:, fanout <= self.max_fanout]
+        self.adjacency = (connecting @ connecting.T).tocsr()
+        self.adjacency.setdiag(0)
+        self.adjacency.eliminate_zeros()
+
+        # Bus membership used by the classification
+        self.on_i2c = self.components_on_signals(self.rules.i2c_signals)
+
+    def _signal_mask(self, signal_names):
+        """
+        Returns:
+        A boolean mask of the incidence matrix columns whose signal is in signal_names.
+        """
+        return np.isin(np.array(self.signal_names, dtype=object), list(signal_names))
+
+    def components_on_signals(self, signal_names):
+        """
+        Finds the components connected to any of the given signals.
+
+        Parameters:
+        - signal_names: Names of the signals, e.g. the I2C bus lines.
+
+        Returns:
+        A boolean array over the components (in the order of component_names).
+        """
+        if not self.component_names:
+            return np.zeros(0, dtype=bool)
+        return (self.incidence @ self._signal_mask(signal_names).astype(np.int32)) > 0
+
+    def signals_of(self, component_name):
+        """
+        Returns:
+        The names of the signals a component is connected to.
+        """
+        row = self.component_index.get(component_name)
+        if row is None:
+            return []
+        return [self.signal_names[column] for column in self.incidence.indices[self.incidence.indptr[row]:self.incidence.indptr[row + 1]]]
+
+    def connected_components(self, component_name):
+        """
+        Finds the components sharing a signal with a component (signals above max_fanout excepted).
+
+        Parameters:
+        - component_name: The name of the component.
+
+        Returns:
+        A list of component names.
+        """
+        row = self.component_index.get(component_name)
+        if row is None:
+            return []
+        neighbours = self.adjacency.indices[self.adjacency.indptr[row]:self.adjacency.indptr[row + 1]]
+        return [self.component_names[neighbour] for neighbour in neighbours]
+
+    def count_pins_for_element(self, component_name):
+        """
+        Counts the number of pins for a component based on connectivity data.
+
+        Parameters:
+        - component_name: The name of the component.
+
+        Returns:
+        The number of unique pins.
+        """
+        row = self.component_index.get(component_name)
+        if row is not None:
+            return int(self.pin_counts[row])
+
+        # Fallback to package-based pin counting if connectivity data doesn't have it
+        return self._count_pins_from_package(component_name)
+
+    def _count_pins_from_package(self, component_name):
+        """
+        Counts the number of SMD pins for a component by examining its package.
+
+        Parameters:
+        - component_name: The name of the component.
+
+        Returns:
+        The number of SMD pins.
+        """
+        element = self.elements_by_name.get(component_name)
+        if element is None:
+            return 0
+
+        library_name = element.attrib.get('library', '')
+        package_name = element.attrib.get('package', '')
+
+        # Find the specific library, then the package within it
+        return self.library_packages.get(library_name, {}).get(package_name, 0)
+
+    def identify_component_type(self, component_name, library_name, value, package_name=""):
+        """
+        Identifies the component type based on name, library, value, and connectivity patterns.
+
+        Parameters:
+        - component_name: The name of the component.
+        - library_name: The library the component belongs to.
+        - value: The component value.
+        - package_name: The package of the component, if available.
+
+        Returns:
+        A string representing the determined component type.
+        """
+        # Rules deciding on the designator, library, package and value alone (memoized per distinct part)
+        candidates, component_type = self.rules.match(designator(component_name), library_name, package_name, value)
+        if not candidates:
+            return component_type
+
+        # Check based on connectivity patterns
+        pin_count = self.count_pins_for_element(component_name)
+        row = self.component_index.get(component_name)
+        is_on_i2c = row is not None and bool(self.on_i2c[row])
+        for rule in candidates:
+            if rule.accepts(pin_count, is_on_i2c):
+                return rule.type
+        return component_type
+
+    def add_component(self, element):
+        """
+        Extracts component information, classifies it, and counts it.
+
+        Parameters:
+        - element: The XML Element representing a component.
+        """
+        name = element.attrib.get('name', '')
+        library_name = element.attrib.get('library', '')
+        package_name = element.attrib.get('package', '')
+        value = element.attrib.get('value', '')
+
+        # Determine component type using the improved identification method
+        component_type = self.identify_component_type(name, library_name, value, package_name)
+
+        # Basic components like resistors, capacitors, and inductors
+        if component_type in ['resistor', 'capacitor', 'inductor']:
+            category = getattr(self, component_type)
+            package_size = ''.join(filter(str.isdigit, package_name))
+
+            if package_size in category:
+                category[package_size] += 1
+            else:
+                category[package_size] = 1
+            return
+
+        # For more complex components, store detailed information
+        category = getattr(self, component_type)
+        pin_count = self.count_pins_for_element(name)
+
+        # Extract additional attributes
+        description = ""
+        company_info = ""
+
+        for child in element:
+            if 'name' in child.attrib:
+                if child.attrib['name'] == 'DESCRIPTION':
+                    description = child.attrib.get('value', '')
+                elif child.attrib['name'] == 'PACKAGE':
+                    package_info = child.attrib.get('value', '').split()
+                    if package_info:
+                        package_name = package_info[0]
+                        company_info = ' '.join(package_info[1:])
+
+        # Get connection information for correlation analysis
+        connections = self.connected_components(name)
+
+        # Signals this component is connected to
+        unique_signals = list(set(self.signals_of(name)))
+
+        # Create component details based on component type
+        if component_type == 'processor':
+            component_details = {
+                "Name": library_name,
+                "Component": name,
+                "Package": package_name,
+                "Package_Area": "",  # Set to empty
+                "Die_Size": "",  # Set to empty
+                "Memory_Size": "",  # Set to empty
+                "Number_of_Pins": pin_count,
+                "GPIO_Count": "",  # Set to empty
+                "Connected_To": connections,
+                "Signals": unique_signals,
+                "Power_Consumption": "",  # Set to empty
+                "Process_Node": "",  # Set to empty
+                "Count": 1,
+                "Company_Info": company_info,
+                "Description": description
+            }
+        elif component_type in ['transistor', 'OpAmp', 'sensor', 'crystal']:
+            component_details = {
+                "Name": library_name,
+                "Component": name,
+                "Package": package_name,
+                "Package_Area": "",  # Set to empty
+                "Die_Size": "",  # Set to empty
+                "Number_of_Pins": pin_count,
+                "Connected_To": connections,
+                "Signals": unique_signals,
+                "Process_Node": "",  # Set to empty
+                "Count": 1,
+                "Company_Info": company_info,
+                "Description": description
+            }
+        else:
+            # Basic details for other components
+            component_details = {
+                "Name": library_name,
+                "Component": name,
+                "Package": package_name,
+                "Number_of_Pins": pin_count,
+                "Connected_To": connections,
+                "Signals": unique_signals,
+                "Count": 1,
+                "Company_Info": company_info,
+                "Description": description
+            }
+
+        # Store or update the component in the appropriate category
+        if name in category:
+            category[name]["Count"] += 1
+        else:
+            category[name] = component_details
+
+    def analyze_component_correlation(self):
+        """
+        Analyzes component correlation based on connectivity patterns.
+
+        Returns:
+        Dictionary with correlation information.
+        """
+        correlation_data = {}
+
+        # Analyze I2C connections
+        i2c_components = [self.component_names[row] for row in np.flatnonzero(self.on_i2c)]
+
+        if i2c_components:
+            correlation_data['I2C_Bus'] = i2c_components
+
+        # Find processor and its direct connections
+        processor_components = list(self.processor.keys())
+        if processor_components:
+            processor = processor_components[0]  # Assuming one processor per board for simplicity
+            processor_connections = {}
+
+            row = self.component_index.get(processor)
+            if row is not None:
+                # Signals each component shares with the processor
+                shared = self.incidence.multiply(self.incidence[row]).tocsr()
+                for connected_comp in self.connected_components(processor):
+                    connected_row = self.component_index[connected_comp]
+                    common_signals = [self.signal_names[column] for column in
+                                      shared.indices[shared.indptr[connected_row]:shared.indptr[connected_row + 1]]]
+                    if common_signals:
+                        processor_connections[connected_comp] = common_signals
+
+            correlation_data['processor_connections'] = processor_connections
+
+        # Identify power supply components
+        power_components = [self.component_names[row] for row in np.flatnonzero(self.components_on_signals(POWER_SIGNALS))]
+
+        if power_components:
+            correlation_data['Power_Components'] = power_components
+
+        return correlation_data
+
+    def get_components(self):
+        """
+        Returns a dictionary with all categorized components.
+
+        Returns:
+        A dictionary with component categories.
+        """
+        # Aggregate categories into a single dictionary
+        categories = {
+            "Resistor": self.resistor,
+            "Capacitor": self.capacitor,
+            "Inductor": self.inductor,
+            "Transistor": self.transistor,
+            "OpAmp": self.OpAmp,
+            "Processor": self.processor,
+            "Sensor": self.sensor,
+            "Crystal": self.crystal,
+            "Connector": self.connector,
+            "Other_Parts": self.otherPart
+        }
+
+        components_summary = {}
+        for category_name, category in categories.items():
+            components_list = []
+            for key, value in category.items():
+                # For basic components, just include package and count
+                if category_name in ["Resistor", "Capacitor", "Inductor"]:
+                    components_list.append({"Package": key, "Count": value})
+                else:
+                    # For more complex components, include all details
+                    if isinstance(value, dict):
+                        component = value.copy()
+                        components_list.append(component)
+            components_summary[category_name] = components_list
+
+        # Add correlation analysis
+        components_summary["Component_Correlation"] = self.analyze_component_correlation()
+
+        return components_summary
+
+def parse_brd_pcb(brd_file_path, rules=None, max_fanout=None):
+    """
+    Parses a .brd PCB design file and returns component information.
+
+    Parameters:
+    - brd_file_path: Path to the .brd file.
+    - rules: Optional component_rules.RuleTable replacing the default classification rules.
+    - max_fanout: Optional fan-out above which a signal does not connect its components (see ComponentCounter).
+
+    Returns:
+    A dictionary with component information and correlation data.
+    """
+    # Read everything needed from the board file in one pass
+    board = read_board(brd_file_path)
+
+    # Create PCB summary from the board dimensions and number of layers
+    length, width = get_board_dimensions(board)
+    pcb_summary = PCBSummary(length, width, count_board_layers(board))
+
+    # Analyze each component
+    components_summary = ComponentCounter(board, rules, max_fanout)
+    for element in board.elements:
+        components_summary.add_component(element)
+
+    # Create the final result dictionary
+    result = {"board": pcb_summary.to_dict()}
+    result.update(components_summary.get_components())
+    return result
+
+if __name__ == "__main__":
+    import sys
+    import json
+    for brd_file_path in sys.argv[1:]:
+        print(json.dumps(parse_brd_pcb(brd_file_path), indent=2))
@@ -0,0 +1,139 @@
+import os
+import re
+import json
+from functools import lru_cache
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "classification_rules.json")
+# component types known to ComponentCounter (names of its category attributes)
+COMPONENT_TYPES = ["resistor", "capacitor", "inductor", "transistor", "OpAmp", "processor", "sensor", "crystal",
+                   "connector", "otherPart"]
+# part matchers of a rule (a rule matches if any of its part matchers does, or if it has none)
+PART_MATCHERS = ["name_prefix", "library", "library_contains", "package_prefix", "value_prefix", "value_contains"]
+# connectivity conditions of a rule (all of them must hold)
+CONNECTIVITY_CONDITIONS = ["pins", "i2c"]
+
+def designator(component_name):
+    """
+    Reference designator of a component name without its number, e.g. "JP" for "JP12".
+
+    Parameters:
+    - component_name: The name of the element on the board.
+
+    Returns:
+    The name with its trailing digits removed.
+    """
+    return component_name.rstrip("0123456789")
+
+class ClassificationRule:
+    """
+    One compiled entry of the rule table.
+    """
+    def __init__(self, entry):
+        """
+        Parameters:
+        - entry: The rule as written in the rule table, e.g. {"type": "OpAmp", "pins": [8, 8], "i2c": false}.
+        """
+        unknown = set(entry) - {"type"} - set(PART_MATCHERS) - set(CONNECTIVITY_CONDITIONS)
+        if entry.get("type") not in COMPONENT_TYPES or unknown:
+            raise ValueError(f"Invalid classification rule {entry}")
+        self.type = entry["type"]
+
+        # all alternatives of a matcher are combined into one regular expression
+        def alternatives(words):
+            return "|".join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+        self.name_regex = re.compile(f"(?:{alternatives(entry['name_prefix'])})") if "name_prefix" in entry else None
+        self.libraries = frozenset(entry.get("library", []))
+        self.library_regex = (re.compile(f".*?(?:{alternatives(entry['library_contains'])})", re.IGNORECASE)
+                              if "library_contains" in entry else None)
+        self.package_regex = re.compile(f"(?:{alternatives(entry['package_prefix'])})") if "package_prefix" in entry else None
+        value_patterns = []
+        if "value_prefix" in entry:
+            value_patterns.append(f"(?:{alternatives(entry['value_prefix'])})")
+        if "value_contains" in entry:
+            value_patterns.append(f".*?(?:{alternatives(entry['value_contains'])})")
+        self.value_regex = re.compile("|".join(value_patterns), re.IGNORECASE) if value_patterns else None
+        self.has_part_matchers = any(matcher in entry for matcher in PART_MATCHERS)
+
+        min_pins, max_pins = entry.get("pins", [None, None])
+        self.min_pins = min_pins if min_pins is not None else 0
+        self.max_pins = max_pins if max_pins is not None else float("inf")
+        self.i2c = entry.get("i2c")
+        self.needs_connectivity = any(condition in entry for condition in CONNECTIVITY_CONDITIONS)
+
+    def matches_part(self, designator, library_name, package_name, value):
+        """
+        Returns:
+        True if the rule has no part matchers or one of them matches.
+        """
+        if not self.has_part_matchers:
+            return True
+        return bool(
+            (self.name_regex is not None and self.name_regex.match(designator))
+            or library_name in self.libraries
+            or (self.library_regex is not None and self.library_regex.match(library_name))
+            or (self.package_regex is not None and self.package_regex.match(package_name))
+            or (self.value_regex is not None and self.value_regex.match(value)))
+
+    def accepts(self, pin_count, is_on_i2c):
+        """
+        Returns:
+        True if the connectivity conditions of the rule hold.
+        """
+        return self.min_pins <= pin_count <= self.max_pins and (self.i2c is None or self.i2c == is_on_i2c)
+
+class RuleTable:
+    """
+    Ordered classification rules; the first rule that matches a component decides its type.
+
+    The part matchers only depend on the designator, library, package and value, which repeat for every instance
+    of a part, so their outcome is memoized per distinct combination. Connectivity conditions (pin count,
+    membership of an I2C signal) are only evaluated for the rules left after that.
+    """
+    def __init__(self, table):
+        """
+        Parameters:
+        - table: {"rules": [...], "default": component type, "i2c_signals": [...]}, see classification_rules.json.
+        """
+        self.table = table
+        self.rules = [ClassificationRule(entry) for entry in table["rules"]]
+        self.default = table.get("default", "otherPart")
+        if self.default not in COMPONENT_TYPES:
+            raise ValueError(f"Invalid default component type {self.default}")
+        self.i2c_signals = frozenset(table.get("i2c_signals", ["SDA", "SCL"]))
+        self.match = lru_cache(maxsize=65536)(self._match)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Parameters:
+        - path: Path to a JSON rule table.
+
+        Returns:
+        The compiled RuleTable.
+        """
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls(json.load(file))
+
+    def _match(self, designator, library_name, package_name, value):
+        """
+        Applies the part matchers of the rules in order.
+
+        Returns:
+        A tuple (candidates, component_type): the rules with connectivity conditions to check in order, and the
+        type given by the first matching rule without conditions (or the default type).
+        """
+        candidates = []
+        for rule in self.rules:
+            if rule.matches_part(designator, library_name, package_name, value):
+                if not rule.needs_connectivity:
+                    return tuple(candidates), rule.type
+                candidates.append(rule)
+        return tuple(candidates), self.default
+
+@lru_cache(maxsize=None)
+def default_rules():
+    """
+    Returns:
+    The RuleTable compiled from classification_rules.json (loaded once).
+    """
+    return RuleTable.from_file(DEFAULT_RULES_PATH)
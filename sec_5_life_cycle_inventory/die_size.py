@@ -0,0 +1,83 @@
+import re
+
+# Map package types to coefficients for estimating die size
+DIE_SIZE_COEFFICIENTS = {
+    'BGA': 0.8,  # This is a placeholder value since there are different values for large and small BGA
+    'LGA': 0.8,  # Added manually, assume QFN is the same as BGA
+    'DIP': 0.5,
+    'PLCC': 0.5,
+    'QFP': 0.5,
+    'QFN': 0.5, # Added manually, assume QFN is the same as QFP
+    'SO': 0.6,
+    'SSOP': 0.5,
+    'TQFP': 0.5,
+    'TSOP': 0.6,
+    'TSSOP': 0.6,
+    'WLP': 0.9,
+    'WLCSP': 0.9 # Added manually, assume WLCSP is the same as WLP
+}
+
+def estimate_die_area(package_area):
+    """
+    Estimates the die size of an IC based on its package area and type.
+
+    Parameters:
+    - package_area: A string representing the package type and area, e.g., "48-QFN (6x6)"
+
+    Returns:
+    The estimated die size in the same units squared as provided in package_area.
+    """
+    # Extract the package type from the string
+    package_type = ''.join(filter(str.isalpha, package_area.split(' ')[-2]))
+
+    # Extract the dimensions from the string
+    dimensions = package_area.split(' ')[-1].strip('()').split('x')
+
+    # If multiple dimensions are found, use them to calculate the die size
+    if len(dimensions) == 2:
+        width, length = float(dimensions[0]), float(dimensions[1])
+        area = width * length
+    else:  # If only one dimension is found, assume it's a square package
+        side = float(dimensions[0])
+        area = side * side
+
+    # Look up the relevant ratio for the package type
+    ratio = DIE_SIZE_COEFFICIENTS.get(package_type, 1)
+
+    # Calculate the die size
+    die_area = area * ratio * ratio
+
+    return die_area
+
+def split_package_area(package_area):
+    """
+    Splits a supplier package description into the package type and dimensions used by the design summary.
+
+    Parameters:
+    - package_area: A string like "48-QFN (6x6)"
+
+    Returns:
+    A tuple (package_type, "length x width"), e.g. ("48-QFN", "6.0 x 6.0"), or None if it cannot be read.
+    """
+    match = re.match(r"^(.*?)\s*\(([\d.]+)(?:x([\d.]+))?\)$", package_area.strip())
+    if match is None:
+        return None
+    package_type, length, width = match.groups()
+    width = width if width is not None else length
+    return package_type, f"{float(length)} x {float(width)}"
+
+def update_die_size(components_dict):
+    """
+    Updates the die size for each IC component in the components_dict based on its package area.
+
+    Parameters:
+    - components_dict: The PCB component table object containing IC details.
+    """
+    # Define the component categories to update
+    categories = ["Transistor", "OpAmp", "Processor", "Sensor"]
+
+    for category in categories:
+        for component in components_dict[category]:
+            package_area = component['Package_Area']
+            if package_area:
+                component['Die_Size'] = estimate_die_area(package_area)
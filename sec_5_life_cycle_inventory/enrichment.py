@@ -0,0 +1,268 @@
+import abc
+import json
+import time
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from die_size import estimate_die_area, split_package_area
+
+logger = logging.getLogger(__name__)
+
+# fields taken over from the part metadata
+PART_FIELDS = ["Package_Area", "Package_Type", "Memory_Size", "GPIO_Count", "Power_Consumption", "Process_Node"]
+# categories of the parse_brd_pcb output that get looked up (same as the notebook)
+ENRICHED_CATEGORIES = ["Transistor", "OpAmp", "Processor", "Sensor"]
+
+class PartMetadataProvider(abc.ABC):
+    """
+    Interface of a part metadata source.
+    """
+    @abc.abstractmethod
+    def lookup(self, part_name):
+        """
+        Looks up one part.
+
+        Parameters:
+        - part_name: The part name, e.g. "ATMEGA4809".
+
+        Returns:
+        A dictionary with some of the PART_FIELDS, or None if the part is unknown.
+        """
+
+class LocalProvider(PartMetadataProvider):
+    """
+    Offline stand-in provider reading part metadata from local files.
+    """
+    def __init__(self, *paths):
+        """
+        Parameters:
+        - paths: JSON files, either {part name: fields} or design summaries (their "IC" entries are used),
+          or SQLite files with a table parts(name, Package_Area, Package_Type, Memory_Size, GPIO_Count,
+          Power_Consumption, Process_Node). Earlier files take precedence.
+        """
+        self.parts = {}
+        for path in reversed(paths):
+            if path.endswith(".json"):
+                with open(path, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+                self.parts.update(data.get("IC", data))
+            else:
+                with sqlite3.connect(path) as connection:
+                    connection.row_factory = sqlite3.Row
+                    for row in connection.execute("SELECT * FROM parts"):
+                        row = dict(row)
+                        self.parts[row.pop("name")] = row
+
+    def lookup(self, part_name):
+        fields = self.parts.get(part_name)
+        if fields is None:
+            return None
+        return {field: fields[field] for field in PART_FIELDS if fields.get(field) not in (None, "")}
+
+class DigikeyProvider(PartMetadataProvider):
+    """
+    Looks parts up with the Digikey keyword search. The API client (pip install
+    git+https://github.com/hurricaneJoef/digikey-api.git) is only imported when the provider is created and reads
+    its credentials from the DIGIKEY_* environment variables.
+    """
+    # Digikey parameter name -> field
+    PARAMETERS = {
+        'Supplier Device Package': 'Package_Area',
+        'Memory Size': 'Memory_Size',
+        'GPIO': 'GPIO_Count',
+    }
+
+    def __init__(self):
+        import digikey
+        from digikey.v4.productinformation import KeywordRequest
+        self.digikey = digikey
+        self.KeywordRequest = KeywordRequest
+
+    def lookup(self, part_name):
+        result = self.digikey.keyword_search(body=self.KeywordRequest(keywords=part_name, limit=1))
+        if not result.products:
+            return None
+        fields = {}
+        for parameter in result.products[0].to_dict().get('parameters', []):
+            field = self.PARAMETERS.get(parameter.get('parameter'))
+            if field is not None:
+                fields[field] = parameter.get('value')
+        return fields
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: at most `capacity` requests at once, refilled with `rate` tokens per second.
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a token is available and takes it.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class MetadataCache:
+    """
+    Persistent SQLite cache of looked up part metadata. Entries (including "part not found") expire after ttl seconds.
+    """
+    def __init__(self, path, ttl=30 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        with sqlite3.connect(self.path) as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, fields TEXT, fetched_at REAL)")
+
+    def get_many(self, part_names):
+        """
+        Parameters:
+        - part_names: Part names to look up.
+
+        Returns:
+        {part name: fields or None} for the names with a fresh entry.
+        """
+        found = {}
+        oldest = time.time() - self.ttl
+        part_names = list(part_names)
+        with sqlite3.connect(self.path) as connection:
+            # chunked to stay below the SQLite limit on query parameters
+            for start in range(0, len(part_names), 500):
+                chunk = part_names[start:start + 500]
+                for name, fields in connection.execute(
+                        f"SELECT name, fields FROM metadata WHERE fetched_at >= ? AND name IN ({','.join('?'*len(chunk))})",
+                        [oldest] + chunk):
+                    found[name] = json.loads(fields)
+        return found
+
+    def put_many(self, metadata):
+        """
+        Parameters:
+        - metadata: {part name: fields or None}
+        """
+        now = time.time()
+        with sqlite3.connect(self.path) as connection:
+            connection.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?, ?)",
+                                   [(name, json.dumps(fields), now) for name, fields in metadata.items()])
+
+def lookup_parts(part_names, provider, cache=None, max_workers=8, rate_limiter=None):
+    """
+    Looks up each distinct part name once: fresh cache entries are used as is, the others are fetched in a thread
+    pool (each request waits for the rate limiter) and stored in the cache. Failed requests are not cached.
+
+    Parameters:
+    - part_names: Part names, duplicates are looked up once.
+    - provider: A PartMetadataProvider.
+    - cache: Optional MetadataCache.
+    - max_workers: Number of concurrent requests.
+    - rate_limiter: Optional TokenBucket shared by the requests.
+
+    Returns:
+    A tuple ({part name: fields or None}, stats) where stats counts cache hits, requests, unknown parts and errors.
+    """
+    names = list(dict.fromkeys(name for name in part_names if name))
+    metadata = cache.get_many(names) if cache is not None and names else {}
+    stats = {"parts": len(names), "cache_hits": len(metadata), "requests": 0, "not_found": 0, "errors": 0}
+
+    def fetch(name):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            return name, provider.lookup(name), None
+        except Exception as e:
+            return name, None, e
+
+    missing = [name for name in names if name not in metadata]
+    fetched = {}
+    if missing:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for name, fields, error in executor.map(fetch, missing):
+                stats["requests"] += 1
+                if error is not None:
+                    stats["errors"] += 1
+                    logger.warning("Lookup of %s failed: %s", name, error)
+                    continue
+                fetched[name] = fields
+    if cache is not None and fetched:
+        cache.put_many(fetched)
+    metadata.update(fetched)
+    stats["not_found"] = sum(1 for fields in metadata.values() if fields is None)
+    return metadata, stats
+
+def apply_part_metadata(ic, fields):
+    """
+    Copies part metadata into a design summary IC entry. A supplier package description ("48-QFN (6x6)") is split
+    into Package_Type and Package_Area ("6.0 x 6.0") and gives the estimated Die_Size.
+
+    Parameters:
+    - ic: The IC entry of a design summary (updated in place).
+    - fields: The part metadata.
+    """
+    for field in PART_FIELDS:
+        if fields.get(field) not in (None, ""):
+            ic[field] = fields[field]
+    package_area = fields.get("Package_Area")
+    package = split_package_area(package_area) if package_area else None
+    if package is not None:
+        ic["Package_Type"], ic["Package_Area"] = package
+        ic["Die_Size"] = estimate_die_area(package_area)
+    elif "Package_Type" in ic and "Package_Area" in ic and "Die_Size" not in ic:
+        length, width = ic["Package_Area"].split(" x ")
+        ic["Die_Size"] = estimate_die_area(f"{ic['Package_Type']} ({float(length)}x{float(width)})")
+
+def enrich_summaries(summaries, provider, cache=None, max_workers=8, rate_limiter=None):
+    """
+    Fills in the IC entries of design summaries (e.g. from batch_inventory), looking every part up once
+    across all summaries.
+
+    Parameters:
+    - summaries: Design summaries, updated in place.
+    - provider, cache, max_workers, rate_limiter: See lookup_parts.
+
+    Returns:
+    The lookup stats.
+    """
+    part_names = [name for summary in summaries for name in summary["IC"]]
+    metadata, stats = lookup_parts(part_names, provider, cache, max_workers, rate_limiter)
+    for summary in summaries:
+        for name, ic in summary["IC"].items():
+            if metadata.get(name):
+                apply_part_metadata(ic, metadata[name])
+    return stats
+
+def enrich_components(components_dict, provider, cache=None, max_workers=8, rate_limiter=None):
+    """
+    Updates the component table of parse_brd_pcb with the Package_Area, Memory_Size and GPIO_Count found for each
+    component "Name" (what the notebook did with one Digikey request per component).
+
+    Parameters:
+    - components_dict: The component table to update.
+    - provider, cache, max_workers, rate_limiter: See lookup_parts.
+
+    Returns:
+    The lookup stats.
+    """
+    components = [component for category in ENRICHED_CATEGORIES for component in components_dict[category]]
+    metadata, stats = lookup_parts([component["Name"] for component in components], provider, cache, max_workers, rate_limiter)
+    for component in components:
+        fields = metadata.get(component["Name"])
+        if not fields:
+            logger.warning("No result found for: %s", component)
+            continue
+        for field in ["Package_Area", "Memory_Size", "GPIO_Count"]:
+            if field in fields:
+                component[field] = fields[field]
+    return stats
@@ -0,0 +1,144 @@
+import os
+import json
+import hashlib
+
+from brd_parser import PARSER_VERSION
+from die_size import DIE_SIZE_COEFFICIENTS
+from component_rules import default_rules
+
+def tables_digest():
+    """
+    Digest of the coefficient and classification rule tables the inventory depends on, so that editing them
+    invalidates the cache.
+
+    Returns:
+    A short hex string.
+    """
+    tables = {"die_size_coefficients": DIE_SIZE_COEFFICIENTS, "classification_rules": default_rules().table}
+    return hashlib.sha256(json.dumps(tables, sort_keys=True).encode()).hexdigest()[:16]
+
+class InventoryCache:
+    """
+    On-disk cache of design summaries, keyed on the contents of the .brd file plus the parser version and
+    coefficient tables. Entries are JSON files in cache_dir; the least recently used ones are evicted once the
+    cache grows beyond max_bytes.
+    """
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024):
+        """
+        Parameters:
+        - cache_dir: Folder holding the cached summaries (created if needed).
+        - max_bytes: Size bound of the cache, enforced by evict().
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version = f"{PARSER_VERSION}-{tables_digest()}"
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, brd_file_path):
+        """
+        Cache key of a board file.
+
+        Parameters:
+        - brd_file_path: Path to the .brd file.
+
+        Returns:
+        The hex digest of the file contents and the parser/table version.
+        """
+        digest = hashlib.sha256(self.version.encode())
+        with open(brd_file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key):
+        """
+        Looks up a summary; a hit marks the entry as recently used.
+
+        Parameters:
+        - key: Cache key from key().
+
+        Returns:
+        The stored summary, or None.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                summary = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.stats["misses"] += 1
+            return None
+        os.utime(path)
+        self.stats["hits"] += 1
+        return summary
+
+    def put(self, key, summary):
+        """
+        Stores a summary. The file is written next to its final name and then renamed, so concurrent
+        workers never read a partial entry.
+
+        Parameters:
+        - key: Cache key from key().
+        - summary: The design summary.
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(summary, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def get_or_generate(self, brd_file_path, generate):
+        """
+        Returns the cached summary of a board, or generates and stores it.
+
+        Parameters:
+        - brd_file_path: Path to the .brd file.
+        - generate: Function computing the summary from the path (e.g. batch_inventory.generate_inventory).
+
+        Returns:
+        A tuple (summary, hit).
+        """
+        key = self.key(brd_file_path)
+        summary = self.get(key)
+        if summary is not None:
+            return summary, True
+        summary = generate(brd_file_path)
+        self.put(key, summary)
+        return summary, False
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache fits in max_bytes.
+
+        Returns:
+        The number of removed entries.
+        """
+        entries = []
+        total_bytes = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            os.remove(path)
+            total_bytes -= size
+            removed += 1
+        self.stats["evictions"] += removed
+        return removed
+
+    def report(self):
+        """
+        Returns:
+        A one-line summary of the hit/miss/eviction counts.
+        """
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / lookups if lookups else 0.0
+        return (f"Inventory cache: {self.stats['hits']} hits, {self.stats['misses']} misses ({hit_rate:.0%} hit rate), "
+                f"{self.stats['evictions']} evictions")
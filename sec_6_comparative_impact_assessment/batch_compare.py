@@ -0,0 +1,97 @@
+import os
+import json
+import argparse
+import itertools
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+
+from classes import *
+from utils import load_design
+from precompute import DesignColumns
+from compare import ComparativeLCA, Options
+
+# designs of the current worker process, set once by _init_worker instead of being sent with every pair
+_worker_designs = None
+_worker_use_v2 = False
+
+def _init_worker(designs, use_v2):
+    global _worker_designs, _worker_use_v2
+    _worker_designs = designs
+    _worker_use_v2 = use_v2
+
+# "x of y units of B covered" for one run, B is fully covered when the proposition is proven
+def _covered_units(result):
+    matched_B, UNmatched_B = result[1]["IC"], result[3]["IC"]
+    ncovered = sum(ic["Count"] for ic in matched_B.values())
+    return ncovered, ncovered + sum(ic["Count"] for ic in UNmatched_B.values())
+
+# proves that design i emits more than (or as much as) design j: A_MORE with A = design i, B = design j.
+# The other direction of a pair is its own ordered pair (j, i), since the solve of a prove direction only limits
+# the units of design A to one use each and maximizes the coverage of design B.
+def _compare_pair(i, j, options_kwargs):
+    comparison = ComparativeLCA.from_designs(_worker_designs[i], _worker_designs[j], use_v2=_worker_use_v2)
+    start_time = perf_counter()
+    result = comparison.run(Options(A_MORE, **options_kwargs))
+    ncovered, ntotal = _covered_units(result)
+    return i, j, {"covered": ncovered, "total": ntotal, "proven": ncovered == ntotal,
+                  "status": comparison.solve_info.get("status"), "time": perf_counter() - start_time}
+
+# Loads every design once and compares all ordered pairs in a process pool.
+# dominance[i][j] is 1 when design i is proven to have a greater (or equal) footprint than design j.
+def batch_compare(design_fpaths, use_v2=False, compressed=False, options_kwargs={}, max_workers=None):
+    designs = []
+    for fpath in design_fpaths:
+        designs.append(DesignColumns(load_design(fpath, compressed=compressed)))
+    n = len(designs)
+    dominance = [[0]*n for _ in range(n)]
+    coverage = [[None]*n for _ in range(n)]
+    runs = {}
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(designs, use_v2)) as executor:
+        futures = [executor.submit(_compare_pair, i, j, options_kwargs) for i, j in itertools.permutations(range(n), 2)]
+        for future in futures:
+            i, j, run_result = future.result()
+            runs[(i, j)] = run_result
+            dominance[i][j] = int(run_result["proven"])
+            coverage[i][j] = run_result["covered"]/max(run_result["total"], 1)
+    # per pair, A_MORE proves design A >= design B and B_MORE design B >= design A
+    pairs = {(i, j): {"A_MORE": runs[(i, j)], "B_MORE": runs[(j, i)]} for i, j in itertools.combinations(range(n), 2)}
+
+    # ranking: designs that dominate more (and are dominated less) come first, ties keep the input order
+    names = [os.path.basename(fpath) for fpath in design_fpaths]
+    ranking = []
+    for i in range(n):
+        ranking.append({"design": names[i],
+                        "dominates": [names[j] for j in range(n) if dominance[i][j] and not dominance[j][i]],
+                        "dominated_by": [names[j] for j in range(n) if dominance[j][i] and not dominance[i][j]],
+                        "equivalent": [names[j] for j in range(n) if dominance[i][j] and dominance[j][i]]})
+    ranking.sort(key=lambda r: len(r["dominated_by"]) - len(r["dominates"]))
+    return {
+        "designs": names,
+        "dominance": dominance,
+        "coverage": coverage,
+        "ranking": ranking,
+        "pairs": [{"design_A": names[i], "design_B": names[j], **pair_result} for (i, j), pair_result in sorted(pairs.items())],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare all pairs of designs in a folder and rank them')
+    parser.add_argument('--example_folder', type=str, default="toy_examples")
+    parser.add_argument('--output', type=str, default="batch_comparison.json")
+    parser.add_argument('--use_v2', action='store_true', default=False)
+    parser.add_argument('--compressed', action='store_true', default=False)
+    parser.add_argument('--no_carbon_footprint', action='store_true', default=False)
+    parser.add_argument('--time_limit', type=float, default=None, help="time limit of each solve in seconds")
+    parser.add_argument('--max_workers', type=int, default=None)
+    args = parser.parse_args()
+
+    design_fpaths = sorted(os.path.join(args.example_folder, f) for f in os.listdir(args.example_folder) if f.endswith(".json"))
+    start_time = perf_counter()
+    batch_result = batch_compare(design_fpaths, use_v2=args.use_v2, compressed=args.compressed, max_workers=args.max_workers,
+                                 options_kwargs={"use_carbon_footprint": not args.no_carbon_footprint,
+                                                 "time_limit": args.time_limit})
+    print(f"Compared {len(design_fpaths)} designs in {perf_counter() - start_time:.2f} seconds")
+    for rank, r in enumerate(batch_result["ranking"]):
+        print(f"{rank+1}. {r['design']}: dominates {len(r['dominates'])}, dominated by {len(r['dominated_by'])}")
+    with open(args.output, "w") as f:
+        json.dump(batch_result, f, indent=4)
+    print("Saved to", args.output)
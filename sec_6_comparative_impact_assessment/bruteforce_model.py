@@ -1,11 +1,11 @@
 import os
-import itertools
 import argparse
 
 from heuristics import heuristic_functions, heuristic_functions_v2
 from classes import *
+from precompute import HeuristicTable
 from utils import *
-from ortools_model import conflicting_heuristics
+from ortools_model import ConflictIndex
 
 def verify_proposition(heuristics, nA, nB, proposition=A_MORE):
     if len(heuristics) == 0:
@@ -31,19 +31,64 @@ def verify_proposition(heuristics, nA, nB, proposition=A_MORE):
     else:
         raise Exception("ERROR: unknown proposition")
 
-def list_to_num(l):
-    return sum([2**i for i, e in enumerate(l) if e == 1])
+# Bitmasks of the parts each heuristic uses up ("from" side) and covers ("to" side) for the given direction.
+# A heuristic using the same part twice can never be part of a valid selection, its from-mask is None.
+def heuristic_masks(heuristics, prove_direction=A_MORE):
+    from_masks = []
+    to_masks = []
+    for h in heuristics:
+        if prove_direction == A_MORE:
+            from_parts, to_parts = h.parts_a, h.parts_b
+        elif prove_direction == B_MORE:
+            from_parts, to_parts = h.parts_b, h.parts_a
+        else:
+            raise Exception("ERROR: proposition NOT_SURE cannot be verified")
+        from_mask = 0
+        for p in from_parts:
+            if from_mask >> p & 1:
+                from_mask = None
+                break
+            from_mask |= 1 << p
+        to_mask = 0
+        for p in to_parts:
+            to_mask |= 1 << p
+        from_masks.append(from_mask)
+        to_masks.append(to_mask)
+    return from_masks, to_masks
+
+# Depth-first branch-and-bound over the selections accepted by verify_proposition. Branches are cut as soon as a
+# part is used twice or the remaining heuristics cannot cover the parts that are still uncovered.
+# Solutions come out in the same order as enumerating itertools.product([0, 1], repeat=nH) would give them.
+# max_solutions caps the number of solutions returned (break_early is max_solutions=1).
+def brute_force_search(filtered_heuristics, nA, nB, nH, prove_direction=A_MORE, break_early=True, max_solutions=None):
+    if break_early:
+        max_solutions = 1
+    from_masks, to_masks = heuristic_masks(filtered_heuristics[:nH], prove_direction)
+    all_parts = (1 << (nB if prove_direction == A_MORE else nA)) - 1
+    # reachable_cover[i]: parts covered by heuristics i ... nH-1 together
+    reachable_cover = [0]*(nH + 1)
+    for i in range(nH - 1, -1, -1):
+        reachable_cover[i] = reachable_cover[i + 1] | to_masks[i]
 
-def brute_force_search(filtered_heuristics, nA, nB, nH, prove_direction=A_MORE, break_early=True):
     result_set = []
-    for selection in itertools.product([0, 1], repeat=nH):
-        selected_heuristics = [h for i, h in enumerate(filtered_heuristics) if selection[i] == 1]
-        if verify_proposition(selected_heuristics, nA, nB, prove_direction):
-            print(f"    Found solution {list_to_num(selection)}/{2**nH}")
-            if break_early:
-                return [selected_heuristics]
-            else:
-                result_set.append(selected_heuristics)
+    # (next heuristic, selection bitmask, used from-parts, covered to-parts)
+    stack = [(0, 0, 0, 0)]
+    while stack:
+        i, selection, used, covered = stack.pop()
+        if covered | reachable_cover[i] != all_parts:
+            continue
+        if i == nH:
+            if selection == 0:
+                continue
+            print(f"    Found solution {selection}/{2**nH}")
+            result_set.append([h for h_i, h in enumerate(filtered_heuristics[:nH]) if selection >> h_i & 1])
+            if max_solutions is not None and len(result_set) >= max_solutions:
+                break
+            continue
+        # the branch without heuristic i is explored first
+        if from_masks[i] is not None and used & from_masks[i] == 0:
+            stack.append((i + 1, selection | 1 << i, used | from_masks[i], covered | to_masks[i]))
+        stack.append((i + 1, selection, used, covered))
     return result_set
 
 if __name__ == "__main__":
@@ -54,6 +99,7 @@ if __name__ == "__main__":
     parser.add_argument('--prove_direction', type=str, default="A_MORE")
     parser.add_argument('--use_v2', action='store_true', default=False)
     parser.add_argument('--break_early', action='store_true', default=False)
+    parser.add_argument('--max_solutions', type=int, default=None, help="stop after this many solutions")
     args = parser.parse_args()
 
     # Create IC instances after extracting and processing Die_Size
@@ -64,12 +110,8 @@ if __name__ == "__main__":
     ics_b = load_design(os.path.join(args.example_folder, args.design_B))
 
     # pre-compute heuristics
-    heuristics = []
     h_functions = heuristic_functions_v2 if args.use_v2 else heuristic_functions
-    for i, ic_a in enumerate(ics_a):
-        for j, ic_b in enumerate(ics_b):
-            for h in h_functions:
-                heuristics.append(Heuristic(ic_a, ic_b, h))
+    heuristics = HeuristicTable(ics_a, ics_b, h_functions).heuristics()
 
     print("Heuristics:")
     if len(heuristics) < 100:
@@ -83,8 +125,7 @@ if __name__ == "__main__":
     wrong_direction_h_ids = [i for i, h in enumerate(heuristics) if h.direction != prove_direction]
 
     print("Remove conflicting heuristics:")
-    heuristic_pairs = conflicting_heuristics(heuristics)
-    conflicting_h_ids = [pair[0] for pair in heuristic_pairs]
+    conflicting_h_ids = ConflictIndex(heuristics).conflicting_ids()
 
     print("Filtered out heuristics:")
     filtered_out_h_ids = set(wrong_direction_h_ids + conflicting_h_ids)
@@ -96,7 +137,8 @@ if __name__ == "__main__":
     nA = len(ics_a)
     nB = len(ics_b)
     brute_force_result = brute_force_search(
-        filtered_heuristics, nA, nB, nH, prove_direction=prove_direction, break_early=args.break_early)
+        filtered_heuristics, nA, nB, nH, prove_direction=prove_direction, break_early=args.break_early,
+        max_solutions=args.max_solutions)
 
     # print results
     if len(brute_force_result) == 0:
@@ -108,7 +150,7 @@ if __name__ == "__main__":
             print("Selected Heuristics:")
             for h in selected_heuristics:
                 print(h)
-            unmatched_summary, covered_parts_A, covered_parts_B, (ncA, ncB) = format_results(selected_heuristics, ics_a, ics_b)
+            unmatched_summary, covered_parts_A, covered_parts_B, (ncA, ncB) = format_results(selected_heuristics, [], [], ics_a, ics_b)
             print(covered_parts_A)
             print(covered_parts_B)
             print(unmatched_summary)
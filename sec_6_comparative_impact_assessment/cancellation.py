@@ -0,0 +1,43 @@
+import threading
+from contextlib import contextmanager
+
+class Cancelled(Exception):
+    pass
+
+# Set from any thread to stop a run (e.g. the UI when the rules change during a solve).
+# The run checks it between phases (check) and a running solver is interrupted through the callbacks
+# registered with interrupting, which are called from the thread that cancels.
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+    # calls interrupt() if the token is cancelled inside the with block (at once if it already is)
+    @contextmanager
+    def interrupting(self, interrupt):
+        with self._lock:
+            self._callbacks.append(interrupt)
+            already_cancelled = self._event.is_set()
+        if already_cancelled:
+            interrupt()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._callbacks.remove(interrupt)
@@ -1,83 +1,143 @@
 import networkx as nx
 
+from emission_factors import default_index
+
 NOT_SURE = 0
 A_MORE = 1
 B_MORE = -1
 
-# carbon footprint value prediction
-epa_slope= -0.0283
-epa_intercept = 1.702
-gpa_slope = -2.609
-gpa_intercept = 168.207
-
-def predict_value(slope, intercept, nm_value):
-    # Calculate the estimated value for a given nanometer value
-    return slope * nm_value + intercept
+# normalized attributes of a part, shared by all its units (see PartTable)
+PART_ATTRIBUTES = ["Name", "Die_Size", "Power_Consumption", "Min_Package_Size", "Process_Node", "GPIO_Count",
+                   "Memory_Size", "Carbon_Footprint"]
+
+# normalized attribute values of an entry of a design summary, in the order of PART_ATTRIBUTES
+def parse_part(dict_design):
+    Name = dict_design["Name"]
+
+    Die_Size = None
+    if "Die_Size" in dict_design:
+        if type(dict_design["Die_Size"]) == str:
+            length, width = map(lambda x: float(x.replace("mm", "")), dict_design["Die_Size"].split(" x "))
+            Die_Size = length*width
+        elif type(dict_design["Die_Size"]) == float:
+            Die_Size = dict_design["Die_Size"]
+        if Die_Size == float("inf"):
+            Die_Size = None
+
+    Power_Consumption = None
+    if "Power_Consumption" in dict_design and dict_design["Power_Consumption"] != "":
+        Power_Consumption = float(dict_design["Power_Consumption"])
+        if Power_Consumption == float("inf"):
+            Power_Consumption = None
+
+    Min_Package_Size = None
+    if "Package_Area" in dict_design:
+        length, width = map(lambda x: float(x.replace("mm", "")), dict_design["Package_Area"].split(" x "))
+        Min_Package_Size = length*width
+    if "Min_Package_Size" in dict_design:
+        length, width = map(lambda x: float(x.replace("mm", "")), dict_design["Min_Package_Size"].split(" x "))
+        Min_Package_Size = length*width
+    if Min_Package_Size == float("inf"):
+        Min_Package_Size = None
+
+    Process_Node = None
+    if "Process_Node" in dict_design and dict_design["Process_Node"] != "":
+        Process_Node = float(dict_design["Process_Node"].split(" nm")[0])
+
+    GPIO_Count = None
+    if "GPIO_Count" in dict_design and dict_design["GPIO_Count"] is not None and dict_design["GPIO_Count"] != "":
+        GPIO_Count = int(dict_design["GPIO_Count"])
+
+    Memory_Size = None
+    if "Memory_Size" in dict_design:
+        Memory_Size = dict_design["Memory_Size"]
+
+    Carbon_Footprint = None
+    if Process_Node != None and Die_Size != None:
+        Carbon_Footprint = float(default_index().die_carbon_footprint(Process_Node))
+    if "Carbon_Footprint" in dict_design:
+        Carbon_Footprint = float(dict_design["Carbon_Footprint"])
+
+    return Name, Die_Size, Power_Consumption, Min_Package_Size, Process_Node, GPIO_Count, Memory_Size, Carbon_Footprint
+
+class PartTable:
+    # Struct-of-arrays store of the parts of a design: one list per attribute of PART_ATTRIBUTES, one row per part.
+    # The JSON entries are only read, and copied when the jsondata of an IC is asked for. json_source can replace
+    # them: a function returning the JSON entry of a row (e.g. decoded on demand, see design_format).
+    def __init__(self, json_source=None):
+        self.columns = {attribute: [] for attribute in PART_ATTRIBUTES}
+        self.entries = []
+        self.json_source = json_source
+
+    def __len__(self):
+        return len(self.entries)
+
+    # adds a part and returns its row; values are the parse_part values if they are already known
+    def add(self, dict_design, values=None):
+        if values is None:
+            values = parse_part(dict_design)
+        for column, value in zip(self.columns.values(), values):
+            column.append(value)
+        self.entries.append(dict_design)
+        return len(self.entries) - 1
+
+    # new dict with the JSON entry of a part, the given count and the carbon footprint when it was estimated
+    def jsondata(self, part, count):
+        jsondata = dict(self.entries[part] if self.json_source is None else self.json_source(part))
+        jsondata["Count"] = count
+        carbon_footprint = self.columns["Carbon_Footprint"][part]
+        if carbon_footprint is not None and "Carbon_Footprint" not in jsondata:
+            jsondata["Carbon_Footprint"] = carbon_footprint
+        return jsondata
 
 class IC:
-    def __init__(self, dict_design, parts_id):
-        self.jsondata = dict_design
-        self.jsondata["Count"] = 1
-
+    # View of one part of a PartTable: the attributes of PART_ATTRIBUTES are read from the table,
+    # an IC only holds its id and count. count > 1 when one IC object stands for several identical units
+    # (compressed designs).
+    __slots__ = ("table", "part", "id", "Count")
+
+    # stand-alone IC with a table of its own
+    def __init__(self, dict_design, parts_id, count=1):
+        self.table = PartTable()
+        self.part = self.table.add(dict_design)
         self.id = parts_id
-        self.Name = dict_design["Name"]
-
-        self.Die_Size = None
-        if "Die_Size" in dict_design:
-            if type(dict_design["Die_Size"]) == str:
-                length, width = map(lambda x: float(x.replace("mm", "")), dict_design["Die_Size"].split(" x "))
-                self.Die_Size = length*width
-            elif type(dict_design["Die_Size"]) == float:
-                self.Die_Size = dict_design["Die_Size"]
-            if self.Die_Size == float("inf"):
-                self.Die_Size = None
-
-        self.Power_Consumption = None
-        if "Power_Consumption" in dict_design and dict_design["Power_Consumption"] != "":
-            self.Power_Consumption = float(dict_design["Power_Consumption"])
-            if self.Power_Consumption == float("inf"):
-                self.Power_Consumption = None
-
-        self.Min_Package_Size = None
-        if "Package_Area" in dict_design:
-            length, width = map(lambda x: float(x.replace("mm", "")), dict_design["Package_Area"].split(" x "))
-            self.Min_Package_Size = length*width
-        if "Min_Package_Size" in dict_design:
-            length, width = map(lambda x: float(x.replace("mm", "")), dict_design["Min_Package_Size"].split(" x "))
-            self.Min_Package_Size = length*width
-        if self.Min_Package_Size == float("inf"):
-            self.Min_Package_Size = None
-
-        self.Process_Node = None
-        if "Process_Node" in dict_design and dict_design["Process_Node"] != "":
-            self.Process_Node = float(dict_design["Process_Node"].split(" nm")[0])
-
-        self.GPIO_Count = None
-        if "GPIO_Count" in dict_design and dict_design["GPIO_Count"] is not None and dict_design["GPIO_Count"] != "":
-            self.GPIO_Count = int(dict_design["GPIO_Count"])
-
-        self.Memory_Size = None
-        if "Memory_Size" in dict_design:
-            self.Memory_Size = dict_design["Memory_Size"]
-
-        self.Carbon_Footprint = None
-        if self.Process_Node != None and self.Die_Size != None:
-            self.Carbon_Footprint = abs(predict_value(epa_slope, epa_intercept, self.Process_Node))
-        if "Carbon_Footprint" in dict_design:
-            self.Carbon_Footprint = float(dict_design["Carbon_Footprint"])
-        elif self.Carbon_Footprint is not None:
-            self.jsondata["Carbon_Footprint"] = self.Carbon_Footprint
+        self.Count = count
+
+    # IC for a part already in a table, nothing is parsed
+    @classmethod
+    def view(cls, table, part, parts_id, count=1):
+        ic = cls.__new__(cls)
+        ic.table = table
+        ic.part = part
+        ic.id = parts_id
+        ic.Count = count
+        return ic
+
+    # copy of the JSON entry of the part with the count of this IC
+    @property
+    def jsondata(self):
+        return self.table.jsondata(self.part, self.Count)
 
     def __str__(self) -> str:
-        return f"id: {self.id}; name: {self.Name}; Die_Size: {self.Die_Size} mm^2; " \
-            f"Power_Consumption: {self.Power_Consumption}; " \
-            f"Min_Package_Size: {self.Min_Package_Size} mm^2; Process_Node: {self.Process_Node}"
+        columns, part = self.table.columns, self.part
+        return f"id: {self.id}; name: {columns['Name'][part]}; Die_Size: {columns['Die_Size'][part]} mm^2; " \
+            f"Power_Consumption: {columns['Power_Consumption'][part]}; " \
+            f"Min_Package_Size: {columns['Min_Package_Size'][part]} mm^2; Process_Node: {columns['Process_Node'][part]}"
 
     def __repr__(self) -> str:
         return self.__str__()
 
+def _part_attribute(attribute):
+    return property(lambda ic: ic.table.columns[attribute][ic.part])
+
+# IC.Name, IC.Die_Size, ... read the part's row of the table
+for attribute in PART_ATTRIBUTES:
+    setattr(IC, attribute, _part_attribute(attribute))
+
 class Heuristic:
-    def __init__(self, ics_a, ics_b, heuristic_function, is_user_defined=False):
+    # direction can be passed in when it was already precomputed (see precompute.HeuristicTable),
+    # the explanation is then only built the first time it is accessed
+    def __init__(self, ics_a, ics_b, heuristic_function, is_user_defined=False, direction=None):
         if type(ics_a) == list:
             self.parts_a = [ic_a.id for ic_a in ics_a]
             self.parts_a_names = [ic_a.Name for ic_a in ics_a]
@@ -90,10 +150,22 @@ class Heuristic:
         else:
             self.parts_b = [ics_b.id]
             self.parts_b_names = [ics_b.Name]
-        self.direction, self.explanation = heuristic_function(ics_a, ics_b)
+        self.ics_a = ics_a
+        self.ics_b = ics_b
+        self.heuristic_function = heuristic_function
+        if direction is None:
+            self.direction, self._explanation = heuristic_function(ics_a, ics_b)
+        else:
+            self.direction, self._explanation = direction, None
         self.heuristic_name = heuristic_function.__name__
         self.user_defined = is_user_defined
-    
+
+    @property
+    def explanation(self):
+        if self._explanation is None:
+            self._explanation = self.heuristic_function(self.ics_a, self.ics_b)[1]
+        return self._explanation
+
     def __str__(self) -> str:
         return f"parts_a: {self.parts_a}; parts_b: {self.parts_b}; direction: {self.direction}; "\
              f"heuristic_name: {self.heuristic_name} (Explanation: {self.explanation})"
@@ -1,140 +1,172 @@
+import logging
 import numpy as np
-from time import perf_counter_ns
+from time import perf_counter
 
 from heuristics import heuristic_functions, heuristic_functions_v2
 from classes import *
 from utils import load_design, format_results_to_json
-from ortools_model import select_heuristics
+from ortools_model import SolverSession
+from cpsat_model import select_heuristics_cpsat
+from matching_model import select_heuristics_matching
+from precompute import DesignColumns, HeuristicTable
+from profiling import RunStats
+from user_rules import UserRules
 
+logger = logging.getLogger(__name__)
+
+# backend: "ortools" (persistent pywraplp model) or "cpsat" (cpsat_model, multi-threaded with incumbents)
+# time_limit: wall-clock budget of a solve in seconds, the best solution found so far is used when it runs out
+# num_workers: search workers of the solver (both backends)
+# relative_gap, on_incumbent: CP-SAT only, see cpsat_model.select_heuristics_cpsat
+# use_matching: answer with a maximum bipartite matching when there are no user rules and the footprint cannot matter,
+# see matching_model.select_heuristics_matching
+# on_progress: called with the name of every phase of a run when it starts
+# cancel_token: cancellation.CancelToken, a run that is cancelled raises cancellation.Cancelled at the next phase
+# or interrupts its solve
 class Options:
-    def __init__(self, prove_direction=A_MORE, use_carbon_footprint=True):
+    def __init__(self, prove_direction=A_MORE, use_carbon_footprint=True, backend="ortools", time_limit=None,
+                 num_workers=8, relative_gap=None, on_incumbent=None, use_matching=True, on_progress=None,
+                 cancel_token=None):
         self.prove_direction = prove_direction
         self.use_carbon_footprint = use_carbon_footprint
+        self.backend = backend
+        self.time_limit = time_limit
+        self.num_workers = num_workers
+        self.relative_gap = relative_gap
+        self.on_incumbent = on_incumbent
+        self.use_matching = use_matching
+        self.on_progress = on_progress
+        self.cancel_token = cancel_token
+
+    # start of a phase of a run
+    def progress(self, phase):
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+        if self.on_progress is not None:
+            self.on_progress(phase)
 
 class ComparativeLCA:
-    def __init__(self, design_A_fpath, design_B_fpath, use_v2=False):
-        self.design_A = load_design(design_A_fpath)
-        self.design_B = load_design(design_B_fpath)
+    # compressed=True solves over distinct parts with multiplicities instead of individual units
+    def __init__(self, design_A_fpath, design_B_fpath, use_v2=False, compressed=False):
+        self._init_designs(load_design(design_A_fpath, compressed=compressed),
+                           load_design(design_B_fpath, compressed=compressed), use_v2)
+
+    # compare designs that are already loaded, either lists of ICs or precompute.DesignColumns
+    # (a design that takes part in many comparisons is then only loaded and converted to columns once)
+    @classmethod
+    def from_designs(cls, design_A, design_B, use_v2=False):
+        comparison = cls.__new__(cls)
+        comparison._init_designs(design_A, design_B, use_v2)
+        return comparison
+
+    def _init_designs(self, design_A, design_B, use_v2):
+        self.columns_A = design_A if isinstance(design_A, DesignColumns) else DesignColumns(design_A)
+        self.columns_B = design_B if isinstance(design_B, DesignColumns) else DesignColumns(design_B)
+        self.design_A = self.columns_A.ics
+        self.design_B = self.columns_B.ics
         self.h_functions = heuristic_functions_v2 if use_v2 else heuristic_functions
+        self.heuristic_table = None # direction matrices, computed on the first run
+        self.solver_session = None # model kept alive between runs, created on the first run
+        self.solve_info = {} # status, objective, best bound and wall time of the last solve
         self.user_heuristic_rules = [] # to be modified from the UI
-        self.user_rules_map = {} # to be modified from the UI
+        self.user_rules = UserRules(self.design_A, self.design_B) # parsed rules and their parts, see user_rules
+        self.stats = None # profiling.RunStats of the last run
+        self.stats_hooks = [] # called with the RunStats after every run, see profiling.recording
 
-    def run(self, options):
+    # returns (matched_A, matched_B, UNmatched_A, UNmatched_B), and a profiling.RunStats as well if return_stats is set;
+    # the stats of the last run are kept in self.stats and passed to every hook in self.stats_hooks
+    def run(self, options, return_stats=False):
+        stats = RunStats(prove_direction=options.prove_direction, use_carbon_footprint=options.use_carbon_footprint,
+                         backend=options.backend)
         # precomputation
-        start_time = perf_counter_ns()
-        heuristics = []
-        for ic_a in self.design_A:
-            for ic_b in self.design_B:
-                for h in self.h_functions:
-                    heuristics.append(Heuristic(ic_a, ic_b, h))
-        end_time = perf_counter_ns()
-        print(f"Precomputation time: {(end_time - start_time)*1e-6:.4f} milliseconds")
+        options.progress("precomputation")
+        with stats.phase("precomputation"):
+            if self.heuristic_table is None:
+                self.heuristic_table = HeuristicTable(self.columns_A, self.columns_B, self.h_functions)
+        logger.info(f"Precomputation time: {stats.phases['precomputation']*1e3:.4f} milliseconds")
 
         # process user heuristic rules
-        start_time = perf_counter_ns()
-        comparator_symbol = ">=" if options.prove_direction == A_MORE else "<=" if options.prove_direction == B_MORE else ""
-        # Making the heuristic rule ids unique
-        left_user_used_ids = []
-        for rule in self.user_heuristic_rules:
-            if rule[0] in self.user_rules_map:
-                left_user_used_ids += [aid for h in self.user_rules_map[rule[0]] for aid in h.parts_a]
-        left_user_used_ids = set(left_user_used_ids)
-        for rule in self.user_heuristic_rules:
-            if rule[0] in self.user_rules_map:
-                continue
-            # rule is a list of values, in this case the table only has one column so 0th item is the string itself
-            lefthandside, righthandside = rule[0].split(comparator_symbol)
-            lefthandside = lefthandside.strip().split(" + ")
-            left_components_list = []
-            total_left_count = 0
-            for left in lefthandside:
-                count_str, name = left.strip().split(" x ")
-                count = int(count_str)
-                total_left_count += count
-            left_used = set()
-            while True:
-                has_count_0 = False
-                left_components = [] # one set
-                for left in lefthandside:
-                    count_str, name = left.strip().split(" x ")
-                    count = int(count_str)
-                    for ic_a in self.design_A:
-                        if ic_a.Name == name and ic_a.id not in left_used and ic_a.id not in left_user_used_ids:
-                            left_components.append(ic_a)
-                            left_used.add(ic_a.id)
-                            count -= 1
-                            if count == 0:
-                                has_count_0 = True
-                                break
-                if len(left_components) == total_left_count:
-                    left_components_list.append(left_components)
-                    left_components = []
-                if has_count_0:
-                    break
-            righthandside = righthandside.strip().split(" + ")
-            right_components_list = []
-            total_right_count = 0
-            for right in righthandside:
-                count_str, name = right.strip().split(" x ")
-                count = int(count_str)
-                total_right_count += count
-            right_used = set()
-            while True:
-                has_count_0 = False
-                right_components = [] # one set
-                for right in righthandside:
-                    count_str, name = right.strip().split(" x ")
-                    count = int(count_str)
-                    for ic_b in self.design_B:
-                        if ic_b.Name == name and ic_b.id not in right_used:
-                            right_components.append(ic_b)
-                            right_used.add(ic_b.id)
-                            count -= 1
-                            if count == 0:
-                                has_count_0 = True
-                                break
-                if len(right_components) == total_right_count:
-                    right_components_list.append(right_components)
-                    right_components = []
-                if has_count_0:
-                    break
-            # apply rules as many times as we could
-            mapped_heuristics = []
-            for num_applied in range(min(len(left_components_list), len(right_components_list))):
-                left_components = left_components_list[num_applied]
-                right_components = right_components_list[num_applied]
-                mapped_heuristics.append(Heuristic(
-                    left_components, right_components, lambda IC_A, IC_B: (options.prove_direction, f"User defined rule: {rule[0]}"), is_user_defined=True))
-                print(mapped_heuristics[-1])
-            self.user_rules_map[rule[0]] = mapped_heuristics
-        rule_text = [rule[0] for rule in self.user_heuristic_rules]
-        for rule, mapped_heuristics in self.user_rules_map.items():
-            if rule in rule_text:
-                heuristics += mapped_heuristics
-        end_time = perf_counter_ns()
-        print(f"User rule parsing time: {(end_time - start_time)*1e-6:.4f} milliseconds")
+        options.progress("user_rules")
+        with stats.phase("user_rules"):
+            # rules are rows of the UI table, the table only has one column so 0th item is the string itself
+            user_heuristics = self.user_rules.heuristics([rule[0] for rule in self.user_heuristic_rules], options.prove_direction)
+            for h in user_heuristics:
+                logger.debug("%s", h)
+        logger.info(f"User rule parsing time: {stats.phases['user_rules']*1e3:.4f} milliseconds")
 
         # select heuristics
         a_indices = [ic_a.id for ic_a in self.design_A]
         b_indices = [ic_b.id for ic_b in self.design_B]
         footprints_a = [ic_a.Carbon_Footprint for ic_a in self.design_A]
         footprints_b = [ic_b.Carbon_Footprint for ic_b in self.design_B]
-        start_time = perf_counter_ns()
-        selected_heuristics, selected_footprints_a, selected_footprints_b = select_heuristics(
-            heuristics, filter_out_conflicts=True, prove_direction=options.prove_direction, use_carbon_footprint=options.use_carbon_footprint,
-            a_indices=a_indices, b_indices=b_indices, footprints_a=footprints_a, footprints_b=footprints_b)
-        end_time = perf_counter_ns()
-        print(f"Comparison algorithm time: {(end_time - start_time)*1e-6:.4f} milliseconds")
+        counts_a = [ic_a.Count for ic_a in self.design_A]
+        counts_b = [ic_b.Count for ic_b in self.design_B]
+        self.solve_info = {}
+        options.progress("selection")
+        with stats.phase("selection"):
+            matching_result = None
+            if options.use_matching and not user_heuristics:
+                start_time = perf_counter()
+                matching_result = select_heuristics_matching(
+                    self.heuristic_table.heuristics(options.prove_direction, filter_out_conflicts=True), filter_out_conflicts=False,
+                    prove_direction=options.prove_direction, use_carbon_footprint=options.use_carbon_footprint,
+                    a_indices=a_indices, b_indices=b_indices, footprints_a=footprints_a, footprints_b=footprints_b,
+                    counts_a=counts_a, counts_b=counts_b)
+            if matching_result is not None:
+                selected_heuristics, selected_footprints_a, selected_footprints_b = matching_result
+                self.solve_info = {"status": "OPTIMAL (matching)", "objective": len(selected_heuristics),
+                                   "best_bound": len(selected_heuristics), "wall_time": perf_counter() - start_time,
+                                   "variables": 0, "constraints": 0}
+            elif options.backend == "cpsat":
+                heuristics = self.heuristic_table.heuristics(options.prove_direction, filter_out_conflicts=True)
+                selected_heuristics, selected_footprints_a, selected_footprints_b = select_heuristics_cpsat(
+                    heuristics + user_heuristics, filter_out_conflicts=True, prove_direction=options.prove_direction,
+                    use_carbon_footprint=options.use_carbon_footprint, a_indices=a_indices, b_indices=b_indices,
+                    footprints_a=footprints_a, footprints_b=footprints_b, counts_a=counts_a, counts_b=counts_b,
+                    num_workers=options.num_workers, time_limit=options.time_limit, relative_gap=options.relative_gap,
+                    on_incumbent=options.on_incumbent, solve_info=self.solve_info, cancel_token=options.cancel_token)
+            else:
+                if self.solver_session is None:
+                    # only heuristics that can end up in a selection (for either direction) are instantiated
+                    self.solver_session = SolverSession(
+                        self.heuristic_table.heuristics(filter_out_conflicts=True), a_indices, b_indices, footprints_a, footprints_b,
+                        counts_a=counts_a, counts_b=counts_b, filter_out_conflicts=False)
+                selected_heuristics, selected_footprints_a, selected_footprints_b = self.solver_session.solve(
+                    prove_direction=options.prove_direction, use_carbon_footprint=options.use_carbon_footprint,
+                    user_heuristics=user_heuristics, time_limit=options.time_limit, solve_info=self.solve_info,
+                    cancel_token=options.cancel_token, num_workers=options.num_workers)
+        logger.info(f"Comparison algorithm time: {stats.phases['selection']*1e3:.4f} milliseconds")
+        logger.info("Solver status: %s", self.solve_info["status"])
 
-        # print results
-        print("Selected Heuristics:")
-        for h in selected_heuristics:
-            print(h)
+        # log results
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Selected Heuristics:")
+            for h in selected_heuristics:
+                logger.debug("%s", h)
         if options.use_carbon_footprint:
-            print("Carbon footprint selection")
-            print("Carbon footprint A:", np.sum([footprints_a[i] for i in selected_footprints_a]))
-            print("Carbon footprint B:", np.sum([footprints_b[i] for i in selected_footprints_b]))
-            print("Footprint selected parts A:", selected_footprints_a)
-            print("Footprint selected parts B:", selected_footprints_b)
+            logger.info("Carbon footprint A: %s", np.sum([footprints_a[i] for i in selected_footprints_a]))
+            logger.info("Carbon footprint B: %s", np.sum([footprints_b[i] for i in selected_footprints_b]))
+            logger.debug("Footprint selected parts A: %s", selected_footprints_a)
+            logger.debug("Footprint selected parts B: %s", selected_footprints_b)
+
+        options.progress("formatting")
+        with stats.phase("formatting"):
+            result = format_results_to_json(selected_heuristics, selected_footprints_a, selected_footprints_b, self.design_A, self.design_B)
 
-        return format_results_to_json(selected_heuristics, selected_footprints_a, selected_footprints_b, self.design_A, self.design_B)
+        stats.counts = {
+            "heuristics_generated": self.heuristic_table.count(),
+            "heuristics_filtered": self.heuristic_table.count(options.prove_direction, filter_out_conflicts=True),
+            "heuristics_user": len(user_heuristics),
+            "heuristics_selected": len(selected_heuristics),
+            "footprints_selected_a": len(selected_footprints_a),
+            "footprints_selected_b": len(selected_footprints_b),
+            "variables": self.solve_info.get("variables"),
+            "constraints": self.solve_info.get("constraints"),
+        }
+        stats.solver = dict(self.solve_info)
+        self.stats = stats
+        for hook in self.stats_hooks:
+            hook(stats)
+        if return_stats:
+            return result, stats
+        return result
@@ -0,0 +1,130 @@
+from ortools.sat.python import cp_model
+from contextlib import nullcontext
+
+from classes import *
+from ortools_model import ConflictIndex, max_applications
+
+# CP-SAT only takes integer coefficients, footprints are compared in units of 1e-4 gram CO2 eq.
+FOOTPRINT_SCALE = 10000
+
+class IncumbentCallback(cp_model.CpSolverSolutionCallback):
+    # calls on_incumbent(objective, best_bound, wall_time, selection) for every improving solution,
+    # selection is the (selected_heuristics, selected_footprints_a, selected_footprints_b) of that solution
+    def __init__(self, on_incumbent, read_selection):
+        super().__init__()
+        self.on_incumbent = on_incumbent
+        self.read_selection = read_selection
+
+    def on_solution_callback(self):
+        self.on_incumbent(self.ObjectiveValue(), self.BestObjectiveBound(), self.WallTime(), self.read_selection(self.Value))
+
+# Same covering/footprint program as ortools_model.select_heuristics, written natively for CP-SAT.
+# num_workers: number of search workers, time_limit: wall-clock budget in seconds,
+# relative_gap: stop once the incumbent is within this gap of the best bound.
+# When the budget runs out the best incumbent is returned; solve_info (a dict) receives the status,
+# objective, best bound and wall time. Cancelling cancel_token (cancellation.CancelToken) stops the search,
+# which then raises cancellation.Cancelled.
+def select_heuristics_cpsat(heuristics, filter_out_conflicts=True, prove_direction=A_MORE, use_carbon_footprint=True,
+                            a_indices=[], b_indices=[], footprints_a=[], footprints_b=[], counts_a=None, counts_b=None,
+                            conflict_index=None, num_workers=8, time_limit=None, relative_gap=None, on_incumbent=None,
+                            solve_info=None, cancel_token=None):
+    model = cp_model.CpModel()
+    if counts_a is None:
+        counts_a = [1]*len(a_indices)
+    if counts_b is None:
+        counts_b = [1]*len(b_indices)
+
+    # Filter out conflicting heuristics and the ones proving the wrong direction (except user-defined ones)
+    if filter_out_conflicts and conflict_index is None:
+        conflict_index = ConflictIndex(heuristics)
+    used_h_ids = []
+    for h_i, h in enumerate(heuristics):
+        if h.user_defined:
+            used_h_ids.append(h_i)
+        elif h.direction == prove_direction and not (filter_out_conflicts and conflict_index.is_conflicting(h)):
+            used_h_ids.append(h_i)
+
+    b_variables = [model.NewIntVar(0, counts_b[i], "b_"+str(i)) for i in b_indices]
+    h_variables = {}
+    a_terms = [[] for _ in a_indices]
+    b_terms = [[] for _ in b_indices]
+    for h_i in used_h_ids:
+        h = heuristics[h_i]
+        if h.user_defined:
+            # Turn on all user-defined heuristics
+            h_variables[h_i] = model.NewConstant(1)
+        else:
+            h_variables[h_i] = model.NewIntVar(0, max_applications(h, counts_a, counts_b), "h_"+str(h_i))
+        for a_i in h.parts_a:
+            a_terms[a_i].append(h_variables[h_i])
+        for b_i in h.parts_b:
+            b_terms[b_i].append(h_variables[h_i])
+    ca_variables = []
+    cb_variables = []
+    if use_carbon_footprint:
+        ca_variables = [model.NewIntVar(0, counts_a[i] if footprints_a[i] is not None else 0, "ca_"+str(i)) for i in a_indices]
+        cb_variables = [model.NewIntVar(0, counts_b[i] if footprints_b[i] is not None else 0, "cb_"+str(i)) for i in b_indices]
+
+    # 1) Each unit of a_i can only be used once
+    for a_i in a_indices:
+        if use_carbon_footprint:
+            model.Add(sum(a_terms[a_i]) + ca_variables[a_i] <= counts_a[a_i])
+        elif a_terms[a_i]:
+            model.Add(sum(a_terms[a_i]) <= counts_a[a_i])
+    # 2) Count units of b_i only if we have heuristics for them
+    for b_i in b_indices:
+        if use_carbon_footprint:
+            model.Add(b_variables[b_i] <= sum(b_terms[b_i]) + cb_variables[b_i])
+        else:
+            model.Add(b_variables[b_i] <= sum(b_terms[b_i]))
+
+    # the carbon footprint of A should be greater than the carbon footprint of B
+    if use_carbon_footprint:
+        footprint_a = sum(round(footprints_a[a_i]*FOOTPRINT_SCALE)*ca_variables[a_i] for a_i in a_indices if footprints_a[a_i] is not None)
+        footprint_b = sum(round(footprints_b[b_i]*FOOTPRINT_SCALE)*cb_variables[b_i] for b_i in b_indices if footprints_b[b_i] is not None)
+        if prove_direction == A_MORE:
+            model.Add(footprint_a >= footprint_b)
+        elif prove_direction == B_MORE:
+            model.Add(footprint_a <= footprint_b)
+
+    model.Maximize(sum(b_variables))
+
+    def read_selection(value):
+        # a heuristic (or footprint) used on several units appears once per unit
+        selected_heuristics = []
+        for h_i, v in h_variables.items():
+            selected_heuristics += [heuristics[h_i]]*value(v)
+        selected_footprints_a = []
+        selected_footprints_b = []
+        for a_i, v in zip(a_indices, ca_variables):
+            selected_footprints_a += [a_i]*value(v)
+        for b_i, v in zip(b_indices, cb_variables):
+            selected_footprints_b += [b_i]*value(v)
+        return selected_heuristics, selected_footprints_a, selected_footprints_b
+
+    solver = cp_model.CpSolver()
+    solver.parameters.num_workers = num_workers
+    if time_limit is not None:
+        solver.parameters.max_time_in_seconds = time_limit
+    if relative_gap is not None:
+        solver.parameters.relative_gap_limit = relative_gap
+    if cancel_token is not None:
+        cancel_token.check() # building the model takes a while
+    with cancel_token.interrupting(solver.StopSearch) if cancel_token is not None else nullcontext():
+        if on_incumbent is not None:
+            status = solver.Solve(model, IncumbentCallback(on_incumbent, read_selection))
+        else:
+            status = solver.Solve(model)
+    if solve_info is not None:
+        solve_info["status"] = solver.StatusName(status)
+        solve_info["objective"] = solver.ObjectiveValue()
+        solve_info["best_bound"] = solver.BestObjectiveBound()
+        solve_info["wall_time"] = solver.WallTime()
+        solve_info["variables"] = len(model.Proto().variables)
+        solve_info["constraints"] = len(model.Proto().constraints)
+    if cancel_token is not None:
+        cancel_token.check()
+    if status != cp_model.OPTIMAL and status != cp_model.FEASIBLE:
+        raise Exception("Solver status:", solver.StatusName(status))
+
+    return read_selection(solver.Value)
@@ -0,0 +1,171 @@
+import json
+import struct
+import zipfile
+import argparse
+import numpy as np
+
+from classes import *
+from precompute_carbon_number import get_nonIC_carbon_footprint
+
+# Columnar design files (.npz): the IC attributes are parsed and normalized once, when converting from the JSON
+# design summary, and stored as numeric columns (NaN where unknown) plus dictionary-encoded strings.
+# The archive members are stored uncompressed so that load() can memory-map them instead of reading them.
+# The JSON entry of every part and the non-IC sections are kept as UTF-8 blobs, for the round trip back to JSON
+# and for IC.jsondata, and are only decoded when asked for.
+# IC columns are the parse_part values of PART_ATTRIBUTES that are numbers (GPIO_Count is converted back to int).
+FORMAT_VERSION = 1
+
+NUMERIC_COLUMNS = ["Die_Size", "Power_Consumption", "Min_Package_Size", "Process_Node", "GPIO_Count", "Carbon_Footprint"]
+
+def _encode_strings(values):
+    # dictionary encoding: (sorted distinct strings, code of each value), None gets code -1
+    table = sorted(set(value for value in values if value is not None))
+    index = {value: code for code, value in enumerate(table)}
+    codes = np.array([-1 if value is None else index[value] for value in values], dtype=np.int32)
+    return np.array(table, dtype=str), codes
+
+def _encode_blobs(texts):
+    # concatenated UTF-8 texts and the offsets delimiting them
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(blob) for blob in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+def _stored_members(fpath):
+    # (offset of the array data, dtype, shape, fortran order) of each member of an uncompressed .npz file
+    members = {}
+    with open(fpath, "rb") as f, zipfile.ZipFile(f) as archive:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{fpath}: member {info.filename} is compressed and cannot be memory-mapped")
+            f.seek(info.header_offset)
+            name_length, extra_length = struct.unpack("<HH", f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            members[info.filename[:-len(".npy")]] = (f.tell(), dtype, shape, fortran_order)
+    return members
+
+class ColumnarDesign:
+    # arrays: name -> numpy array (memory-mapped when loaded from a file), see from_json_data for the members
+    def __init__(self, arrays):
+        self.arrays = arrays
+        version = int(arrays["format_version"][0])
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar design version {version}")
+        self.board_footprint, self.non_ic_footprint = map(float, arrays["non_ic_footprints"])
+
+    def __len__(self):
+        return len(self.arrays["Count"])
+
+    @classmethod
+    def from_json_data(cls, json_data):
+        parts = list(json_data["IC"].items())
+        # the only place where the attributes are parsed
+        values = {attribute: column for attribute, column in
+                  zip(PART_ATTRIBUTES, zip(*[parse_part(part) for _, part in parts]))} if parts else \
+                 {attribute: () for attribute in PART_ATTRIBUTES}
+        arrays = {"format_version": np.array([FORMAT_VERSION], dtype=np.int64)}
+        arrays["keys"] = np.array([key for key, _ in parts], dtype=str)
+        arrays["name_table"], arrays["name_codes"] = _encode_strings(values["Name"])
+        arrays["Count"] = np.array([int(part["Count"]) for _, part in parts], dtype=np.int64)
+        for column in NUMERIC_COLUMNS:
+            arrays[column] = np.array([np.nan if value is None else value for value in values[column]], dtype=np.float64)
+        arrays["memory_table"], arrays["memory_codes"] = _encode_strings(
+            [None if value is None else str(value) for value in values["Memory_Size"]])
+        arrays["parts_json"], arrays["parts_offsets"] = _encode_blobs(
+            [json.dumps(part, ensure_ascii=False) for _, part in parts])
+        non_ic_data = {key: value for key, value in json_data.items() if key != "IC"}
+        arrays["non_ic_json"], _ = _encode_blobs([json.dumps(non_ic_data, ensure_ascii=False)])
+        arrays["non_ic_footprints"] = np.array(get_nonIC_carbon_footprint(non_ic_data), dtype=np.float64)
+        return cls(arrays)
+
+    @classmethod
+    def from_json(cls, json_fpath):
+        with open(json_fpath, "r") as f:
+            return cls.from_json_data(json.load(f))
+
+    def save(self, npz_fpath):
+        # np.savez stores the members uncompressed, as load() needs
+        np.savez(npz_fpath, **self.arrays)
+
+    @classmethod
+    def load(cls, npz_fpath, mmap=True):
+        if not mmap:
+            with np.load(npz_fpath) as data:
+                return cls({name: data[name] for name in data.files})
+        arrays = {}
+        for name, (offset, dtype, shape, fortran_order) in _stored_members(npz_fpath).items():
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(npz_fpath, dtype=dtype, mode="r", offset=offset, shape=shape,
+                                         order="F" if fortran_order else "C")
+        return cls(arrays)
+
+    def part_json(self, part):
+        # JSON entry of a part, as in the design summary
+        offsets = self.arrays["parts_offsets"]
+        return json.loads(self.arrays["parts_json"][offsets[part]:offsets[part + 1]].tobytes().decode("utf-8"))
+
+    def non_ic_data(self):
+        return json.loads(self.arrays["non_ic_json"].tobytes().decode("utf-8"))
+
+    def to_json_data(self):
+        json_data = self.non_ic_data()
+        json_data["IC"] = {key: self.part_json(part) for part, key in enumerate(self.arrays["keys"].tolist())}
+        return json_data
+
+    def to_json(self, json_fpath):
+        with open(json_fpath, "w") as f:
+            json.dump(self.to_json_data(), f, ensure_ascii=False, indent=4)
+
+    def ics(self, compressed=False):
+        # same ICs and ids as utils.load_design would create from the JSON, without the non-IC parts;
+        # they share one PartTable whose JSON entries are decoded from the file when asked for
+        names = self.arrays["name_table"].tolist()
+        memory_sizes = self.arrays["memory_table"].tolist()
+        columns = {column: [None if value != value else value for value in self.arrays[column].tolist()]  # NaN != NaN
+                   for column in NUMERIC_COLUMNS}
+        columns["GPIO_Count"] = [None if value is None else int(value) for value in columns["GPIO_Count"]]
+        columns["Name"] = [names[code] for code in self.arrays["name_codes"].tolist()]
+        columns["Memory_Size"] = [None if code < 0 else memory_sizes[code] for code in self.arrays["memory_codes"].tolist()]
+        table = PartTable(json_source=self.part_json)
+        for attribute in PART_ATTRIBUTES:
+            table.columns[attribute] = columns[attribute]
+        counts = self.arrays["Count"].tolist()
+        table.entries = [None] * len(counts)
+
+        ics = []
+        ncount = 0
+        for part, count in enumerate(counts):
+            if compressed:
+                ics.append(IC.view(table, part, ncount, count))
+                ncount += 1
+                continue
+            for j in range(count):
+                ics.append(IC.view(table, part, ncount + j))
+            ncount += count
+        return ics
+
+def json_to_npz(json_fpath, npz_fpath):
+    ColumnarDesign.from_json(json_fpath).save(npz_fpath)
+
+def npz_to_json(npz_fpath, json_fpath):
+    ColumnarDesign.load(npz_fpath).to_json(json_fpath)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert design summaries between JSON and the columnar .npz format')
+    parser.add_argument('inputs', nargs='+', help=".json files are converted to .npz and .npz files to .json")
+    args = parser.parse_args()
+    for fpath in args.inputs:
+        if fpath.endswith(".npz"):
+            output_fpath = fpath[:-len(".npz")] + ".json"
+            npz_to_json(fpath, output_fpath)
+        else:
+            output_fpath = fpath.rsplit(".", 1)[0] + ".npz"
+            json_to_npz(fpath, output_fpath)
+        print(fpath, "->", output_fpath)
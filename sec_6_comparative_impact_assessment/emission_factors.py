@@ -0,0 +1,132 @@
+import os
+import re
+import json
+import argparse
+import numpy as np
+from functools import lru_cache
+
+LCA_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sec_5_life_cycle_inventory", "lca_data")
+
+# Published linear fits of the logic manufacturing factors against the process node (nm):
+# epa: electricity per area, gpa: gases per area. They are the default for the IC footprint and the node ratio,
+# since the logic tables only cover 3 to 28 nm and most parts of the designs are older nodes.
+LOGIC_FITS = {
+    "epa": (-0.0283, 1.702), # (slope, intercept)
+    "gpa": (-2.609, 168.207),
+}
+# logic tables used instead of the fits with logic_source="tables"
+LOGIC_TABLES = {"epa": "logic/epa", "gpa": "logic/gpa_99"}
+
+NODE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*nm")
+
+def _flatten(data, prefix=""):
+    # (key, value) of every number in a (nested) JSON table, nested keys joined with "/"
+    for key, value in data.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}/")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", float(value)
+
+def _node(key):
+    match = NODE_PATTERN.search(key)
+    return float(match.group(1)) if match else np.nan
+
+def _table_files(lca_data_dir):
+    # table name (path in lca_data without .json) -> file path
+    files = {}
+    for root, _, fnames in os.walk(lca_data_dir):
+        for fname in fnames:
+            if fname.endswith(".json"):
+                fpath = os.path.join(root, fname)
+                files[os.path.relpath(fpath, lca_data_dir)[:-len(".json")].replace(os.sep, "/")] = fpath
+    return dict(sorted(files.items()))
+
+class EmissionTable:
+    # One table of lca_data as sorted arrays: keys, process node of each key (NaN if the key has none) and values.
+    # Rows are sorted by node (rows without a node last); rows sharing a node are averaged for the interpolation.
+    def __init__(self, keys, values):
+        nodes = np.array([_node(key) for key in keys], dtype=np.float64)
+        order = np.lexsort((np.arange(len(keys)), nodes))
+        self.keys = np.array(keys, dtype=str)[order]
+        self.nodes = nodes[order]
+        self.values = np.asarray(values, dtype=np.float64)[order]
+        with_node = ~np.isnan(self.nodes)
+        self.grid_nodes, inverse = np.unique(self.nodes[with_node], return_inverse=True)
+        self.grid_values = (np.bincount(inverse, weights=self.values[with_node], minlength=len(self.grid_nodes))
+                            / np.bincount(inverse, minlength=len(self.grid_nodes)))
+
+    def __getitem__(self, key):
+        return float(self.values[np.flatnonzero(self.keys == key)[0]])
+
+    def to_dict(self):
+        return dict(zip(self.keys.tolist(), self.values.tolist()))
+
+    # Piecewise-linear interpolation of the values by node, in linear or log-log space ("log").
+    # nodes can be a number or an array; outside the nodes of the table the closest value is used.
+    def interpolate(self, nodes, scale="linear"):
+        if len(self.grid_nodes) == 0:
+            raise ValueError("The table has no process nodes")
+        if scale == "log":
+            return np.exp(np.interp(np.log(nodes), np.log(self.grid_nodes), np.log(self.grid_values)))
+        return np.interp(nodes, self.grid_nodes, self.grid_values)
+
+class EmissionFactorIndex:
+    # All tables of lca_data by name (e.g. "logic/epa", "dram/dram_hynix", "pcb/pcb_substrate"), loaded once.
+    # logic_source: "fit" (LOGIC_FITS) or "tables" (interpolation of LOGIC_TABLES) for the logic factors.
+    def __init__(self, tables, logic_source="fit"):
+        if logic_source not in ("fit", "tables"):
+            raise ValueError(f"Unknown logic factor source {logic_source}")
+        self.tables = tables
+        self.logic_source = logic_source
+
+    def __getitem__(self, name):
+        return self.tables[name]
+
+    @classmethod
+    def from_directory(cls, lca_data_dir=LCA_DATA_DIR, **kwargs):
+        tables = {}
+        for name, fpath in _table_files(lca_data_dir).items():
+            with open(fpath, "r") as f:
+                entries = list(_flatten(json.load(f)))
+            tables[name] = EmissionTable([key for key, _ in entries], [value for _, value in entries])
+        return cls(tables, **kwargs)
+
+    # logic manufacturing factor ("epa" or "gpa") of process nodes (a number or an array, in nm)
+    def logic(self, kind, nodes):
+        if self.logic_source == "fit":
+            slope, intercept = LOGIC_FITS[kind]
+            return slope * nodes + intercept
+        return self.tables[LOGIC_TABLES[kind]].interpolate(nodes)
+
+    # carbon footprint estimate of a die, from its process node
+    def die_carbon_footprint(self, nodes):
+        return abs(self.logic("epa", nodes))
+
+    # relative footprint per die area of node_A compared to node_B (1 for node_B), averaging electricity and gases
+    def node_ratio(self, node_A, node_B):
+        epa_ratio = self.logic("epa", node_A) / self.logic("epa", node_B)
+        gpa_ratio = self.logic("gpa", node_A) / self.logic("gpa", node_B)
+        return (epa_ratio + gpa_ratio)/2
+
+@lru_cache(maxsize=None)
+def default_index():
+    # the index of lca_data, used for the IC footprints and the process node ratios
+    return EmissionFactorIndex.from_directory()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Emission factor tables of lca_data')
+    parser.add_argument('--table', type=str, default=None, help="print this table, e.g. logic/epa")
+    parser.add_argument('--nodes', type=float, nargs='*', default=[], help="interpolate the table at these nodes (nm)")
+    parser.add_argument('--scale', type=str, default="linear", choices=["linear", "log"])
+    args = parser.parse_args()
+    index = default_index()
+    if args.table is None:
+        for name, table in index.tables.items():
+            print(f"{name}: {len(table.keys)} entries, {len(table.grid_nodes)} process nodes")
+    else:
+        table = index[args.table]
+        for key, value in table.to_dict().items():
+            print(f"{key}: {value}")
+        if args.nodes:
+            for node, value in zip(args.nodes, table.interpolate(np.array(args.nodes), args.scale)):
+                print(f"{node} nm -> {value}")
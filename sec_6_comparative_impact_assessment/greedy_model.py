@@ -1,65 +1,82 @@
 import os
+import heapq
+import random
 import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
 from heuristics import heuristic_functions, heuristic_functions_v2
 from classes import *
+from precompute import HeuristicTable
 from utils import *
-from ortools_model import conflicting_heuristics
-from bruteforce_model import verify_proposition
+from ortools_model import ConflictIndex
+from bruteforce_model import heuristic_masks
 
-def covered_from_parts(current_selection, prove_direction):
-    if prove_direction == A_MORE:
-        return [p for h in current_selection for p in h.parts_a]
-    elif prove_direction == B_MORE:
-        return [p for h in current_selection for p in h.parts_b]
-    else:
-        raise Exception("ERROR: invalid prove_direction")
+# Greedy selection over the heuristic order given by `order`, on the bitmasks of bruteforce_model.heuristic_masks.
+# The first heuristic is always taken, then the heuristic with the best score that does not reuse a part, where the
+# score is the number of used from-parts plus covered to-parts (ties go to the earliest heuristic in the order).
+# Scores only go down as parts get covered, so stale scores kept in a heap are upper bounds and only the top of the
+# heap has to be re-evaluated (lazy greedy / CELF). Returns the selected positions if all to-parts get covered.
+def _greedy_indices(from_masks, to_masks, all_parts, order):
+    first = order[0]
+    if from_masks[first] is None:
+        return None
+    selection = [first]
+    used = from_masks[first]
+    covered = to_masks[first]
+    def gain(h_i):
+        return bin(from_masks[h_i]).count("1") + bin(to_masks[h_i] & ~covered).count("1")
+    heap = [(-gain(h_i), rank, h_i) for rank, h_i in enumerate(order[1:]) if from_masks[h_i] is not None]
+    heapq.heapify(heap)
+    while covered != all_parts:
+        best = None
+        while heap:
+            _, rank, h_i = heapq.heappop(heap)
+            if used & from_masks[h_i]:
+                continue # a part would be used twice, and used parts stay used
+            entry = (-gain(h_i), rank, h_i)
+            if not heap or entry <= heap[0]:
+                best = h_i
+                break
+            heapq.heappush(heap, entry)
+        if best is None:
+            return None
+        selection.append(best)
+        used |= from_masks[best]
+        covered |= to_masks[best]
+    return selection
 
-def can_add_heuristic(h_add, current_selection, prove_direction=A_MORE):
-    if len(current_selection) == 0:
-        return 0
-    if prove_direction == A_MORE:
-        from_parts = covered_from_parts(current_selection, prove_direction) + h_add.parts_a
-        unique_from_parts = set(from_parts)
-        # check that from parts are not used more than once
-        if len(unique_from_parts) != len(from_parts):
-            return -1
-        to_parts = set([p for h in current_selection for p in h.parts_b] + h_add.parts_b)
-        return len(unique_from_parts) + len(to_parts)
-    elif prove_direction == B_MORE:
-        from_parts = covered_from_parts(current_selection, prove_direction) + h_add.parts_b
-        unique_from_parts = set(from_parts)
-        if len(unique_from_parts) != len(from_parts):
-            return -1
-        to_parts = set([p for h in current_selection for p in h.parts_a] + h_add.parts_a)
-        return len(unique_from_parts) + len(to_parts)
+def _greedy_restart(from_masks, to_masks, all_parts, seed):
+    order = list(range(len(from_masks)))
+    random.Random(seed).shuffle(order)
+    return _greedy_indices(from_masks, to_masks, all_parts, order)
 
-def greedy_search(heuristics, nA, nB, prove_direction=A_MORE, randomize=True):
-    greedy_result = None
+def greedy_search(heuristics, nA, nB, prove_direction=A_MORE, randomize=True, seed=None):
     if len(heuristics) == 0:
-        return greedy_result
+        return None
+    from_masks, to_masks = heuristic_masks(heuristics, prove_direction)
+    all_parts = (1 << (nB if prove_direction == A_MORE else nA)) - 1
+    order = list(range(len(heuristics)))
     if randomize:
-        import random
-        random.shuffle(heuristics)
-    print(f"Greedy search with initial heuristic: {heuristics[0]}")
-    current_selection = [heuristics[0]]
-    remaining_heuristics = heuristics[1:]
-    while True:
-        best_score = -1
-        best_heuristic = None
-        for h in remaining_heuristics:
-            score = can_add_heuristic(h, current_selection)
-            if score > best_score:
-                best_score = score
-                best_heuristic = h
-        if best_score == -1:
-            break
-        current_selection.append(best_heuristic)
-        remaining_heuristics.remove(best_heuristic)
-        if verify_proposition(current_selection, nA, nB, prove_direction):
-            greedy_result = current_selection
-            break
-    return greedy_result
+        random.Random(seed).shuffle(order)
+    print(f"Greedy search with initial heuristic: {heuristics[order[0]]}")
+    selection = _greedy_indices(from_masks, to_masks, all_parts, order)
+    if selection is None:
+        return None
+    return [heuristics[h_i] for h_i in selection]
+
+# n_restarts randomized greedy searches spread over a process pool, returns the smallest selection found (or None)
+def greedy_restarts(heuristics, nA, nB, prove_direction=A_MORE, n_restarts=8, max_workers=None, seed=0):
+    if len(heuristics) == 0:
+        return None
+    from_masks, to_masks = heuristic_masks(heuristics, prove_direction)
+    all_parts = (1 << (nB if prove_direction == A_MORE else nA)) - 1
+    restart = partial(_greedy_restart, from_masks, to_masks, all_parts)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        selections = [s for s in executor.map(restart, range(seed, seed + n_restarts)) if s is not None]
+    if len(selections) == 0:
+        return None
+    return [heuristics[h_i] for h_i in min(selections, key=len)]
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Greedy search for LCA-for-PCB')
@@ -69,6 +86,8 @@ if __name__ == "__main__":
     parser.add_argument('--prove_direction', type=str, default="A_MORE")
     parser.add_argument('--use_v2', action='store_true', default=False)
     parser.add_argument('--should_randomize', action='store_true', default=False)
+    parser.add_argument('--n_restarts', type=int, default=1, help="randomized restarts run in parallel")
+    parser.add_argument('--max_workers', type=int, default=None)
     args = parser.parse_args()
 
     # Create IC instances after extracting and processing Die_Size
@@ -79,12 +98,8 @@ if __name__ == "__main__":
     ics_b = load_design(os.path.join(args.example_folder, args.design_B))
 
     # pre-compute heuristics
-    heuristics = []
     h_functions = heuristic_functions_v2 if args.use_v2 else heuristic_functions
-    for i, ic_a in enumerate(ics_a):
-        for j, ic_b in enumerate(ics_b):
-            for h in h_functions:
-                heuristics.append(Heuristic(ic_a, ic_b, h))
+    heuristics = HeuristicTable(ics_a, ics_b, h_functions).heuristics()
 
     print("Heuristics:")
     if len(heuristics) < 100:
@@ -98,8 +113,7 @@ if __name__ == "__main__":
     wrong_direction_h_ids = [i for i, h in enumerate(heuristics) if h.direction != prove_direction]
 
     print("Remove conflicting heuristics:")
-    heuristic_pairs = conflicting_heuristics(heuristics)
-    conflicting_h_ids = [pair[0] for pair in heuristic_pairs]
+    conflicting_h_ids = ConflictIndex(heuristics).conflicting_ids()
 
     print("Filtered out heuristics:")
     filtered_out_h_ids = set(wrong_direction_h_ids + conflicting_h_ids)
@@ -109,7 +123,11 @@ if __name__ == "__main__":
     print(f"Greedily select heuristics to prove the direction {args.prove_direction}:")
     nA = len(ics_a)
     nB = len(ics_b)
-    greedy_result = greedy_search(filtered_heuristics, nA, nB, prove_direction=prove_direction, randomize=args.should_randomize)
+    if args.n_restarts > 1:
+        greedy_result = greedy_restarts(filtered_heuristics, nA, nB, prove_direction=prove_direction,
+                                        n_restarts=args.n_restarts, max_workers=args.max_workers)
+    else:
+        greedy_result = greedy_search(filtered_heuristics, nA, nB, prove_direction=prove_direction, randomize=args.should_randomize)
 
     # print results
     if greedy_result is None:
@@ -119,7 +137,7 @@ if __name__ == "__main__":
         print("Selected Heuristics:")
         for h in selected_heuristics:
             print(h)
-        unmatched_summary, covered_parts_A, covered_parts_B, (ncA, ncB) = format_results(selected_heuristics, ics_a, ics_b)
+        unmatched_summary, covered_parts_A, covered_parts_B, (ncA, ncB) = format_results(selected_heuristics, [], [], ics_a, ics_b)
         print(covered_parts_A)
         print(covered_parts_B)
         print(unmatched_summary)
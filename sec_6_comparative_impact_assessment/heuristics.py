@@ -1,4 +1,5 @@
 from classes import A_MORE, B_MORE, NOT_SURE
+from emission_factors import default_index
 
 ###################################### HEURISTICS V1 ######################################
 
@@ -47,21 +48,10 @@ def Compare_Package_Size(IC_A, IC_B):
 heuristic_functions = [Compare_Die_Size, Compare_Power_Consumption, Compare_Package_Size, Compare_Process_Node]
 
 ###################################### HEURISTICS V2 ######################################
-epa_slope= -0.0283
-epa_intercept = 1.702
-gpa_slope = -2.609
-gpa_intercept = 168.207
-
-def predict_value(slope, intercept, nm_value):
-    # Calculate the estimated value for a given nanometer value
-    return slope * nm_value + intercept
-
 def nm_compare(node_A, node_B):
     # Calculate the ratio of the two nodes, return the relative percentage of IC_A/IC_B, IC_B is the baseline so is 1
-    epa_ratio = predict_value(epa_slope, epa_intercept, node_A) / predict_value(epa_slope, epa_intercept, node_B)
-    gpa_ratio = predict_value(gpa_slope, gpa_intercept, node_A) / predict_value(gpa_slope, gpa_intercept, node_B)
-    # print(f"epa_ratio: {epa_ratio}, gpa_ratio: {gpa_ratio}")
-    return (epa_ratio + gpa_ratio)/2
+    # (nodes can be numbers or arrays, see emission_factors.EmissionFactorIndex.node_ratio)
+    return default_index().node_ratio(node_A, node_B)
 
 # Rule 1: Die (Die Size & Process Node)
 def Compare_Effective_Die_Size(IC_A, IC_B):
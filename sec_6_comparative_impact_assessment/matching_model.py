@@ -0,0 +1,147 @@
+import os
+import argparse
+import itertools
+from time import perf_counter
+
+from heuristics import heuristic_functions, heuristic_functions_v2
+from classes import *
+from utils import *
+from precompute import HeuristicTable
+from ortools_model import ConflictIndex
+from cpsat_model import select_heuristics_cpsat
+
+# Maximum bipartite matching. The left side is given as CSR arrays: the neighbours of left vertex u are
+# indices[indptr[u]:indptr[u+1]]. Returns match_left, match_right (-1 for unmatched vertices).
+def hopcroft_karp(indptr, indices, n_right):
+    n_left = len(indptr) - 1
+    match_left = [-1]*n_left
+    match_right = [-1]*n_right
+    infinity = n_left + 1
+    while True:
+        # BFS: layer the left vertices by alternating path length from the free ones
+        dist = [infinity]*n_left
+        queue = [u for u in range(n_left) if match_left[u] == -1]
+        for u in queue:
+            dist[u] = 0
+        found_free = False
+        q_i = 0
+        while q_i < len(queue):
+            u = queue[q_i]
+            q_i += 1
+            for k in range(indptr[u], indptr[u+1]):
+                w = match_right[indices[k]]
+                if w == -1:
+                    found_free = True
+                elif dist[w] == infinity:
+                    dist[w] = dist[u] + 1
+                    queue.append(w)
+        if not found_free:
+            break
+        # DFS along the layers (iterative), augmenting vertex-disjoint paths
+        next_edge = list(indptr[:-1])
+        for root in range(n_left):
+            if match_left[root] != -1:
+                continue
+            stack = [root]
+            path = [] # right vertex used to leave each vertex of the stack
+            while stack:
+                u = stack[-1]
+                if next_edge[u] == indptr[u+1]:
+                    dist[u] = infinity # dead end for this phase
+                    stack.pop()
+                    if path:
+                        path.pop()
+                    continue
+                v = indices[next_edge[u]]
+                next_edge[u] += 1
+                w = match_right[v]
+                if w == -1:
+                    path.append(v)
+                    for x, y in zip(stack, path):
+                        match_left[x] = y
+                        match_right[y] = x
+                    break
+                if dist[w] == dist[u] + 1:
+                    stack.append(w)
+                    path.append(v)
+    return match_left, match_right
+
+# Fast path for select_heuristics (same arguments and return values). Without user-defined rules every heuristic
+# compares one part of A with one part of B, and "each unit of A used at most once, maximize covered units of B"
+# is a maximum bipartite matching between units. Returns None when the program is genuinely combinatorial:
+# set-heuristics are present, or the footprint inequality could add coverage the matching cannot reach.
+def select_heuristics_matching(heuristics, filter_out_conflicts=True, prove_direction=A_MORE, use_carbon_footprint=True,
+                               a_indices=[], b_indices=[], footprints_a=[], footprints_b=[], counts_a=None, counts_b=None,
+                               conflict_index=None):
+    if any(h.user_defined or len(h.parts_a) != 1 or len(h.parts_b) != 1 for h in heuristics):
+        return None
+    if counts_a is None:
+        counts_a = [1]*len(a_indices)
+    if counts_b is None:
+        counts_b = [1]*len(b_indices)
+    if filter_out_conflicts and conflict_index is None:
+        conflict_index = ConflictIndex(heuristics)
+
+    # one heuristic per (a, b) pair is enough to cover it
+    pair_heuristics = {}
+    for h in heuristics:
+        if h.direction != prove_direction or (filter_out_conflicts and conflict_index.is_conflicting(h)):
+            continue
+        pair_heuristics.setdefault((h.parts_a[0], h.parts_b[0]), h)
+    neighbours = [[] for _ in a_indices]
+    for a_i, b_i in pair_heuristics:
+        neighbours[a_i].append(b_i)
+
+    # expand parts to units: unit slots of part b_i are first_b_slot[b_i] ... first_b_slot[b_i] + counts_b[b_i] - 1
+    first_b_slot = [0]*len(b_indices)
+    for b_i in b_indices[1:]:
+        first_b_slot[b_i] = first_b_slot[b_i - 1] + counts_b[b_i - 1]
+    n_b_slots = sum(counts_b)
+    slot_a = []
+    indptr = [0]
+    indices = []
+    for a_i in a_indices:
+        b_slots = [first_b_slot[b_i] + k for b_i in neighbours[a_i] for k in range(counts_b[b_i])]
+        for _ in range(counts_a[a_i]):
+            slot_a.append(a_i)
+            indices += b_slots
+            indptr.append(len(indices))
+    slot_b = [b_i for b_i in b_indices for _ in range(counts_b[b_i])]
+
+    match_left, match_right = hopcroft_karp(indptr, indices, n_b_slots)
+    n_matched = sum(1 for v in match_left if v != -1)
+    if use_carbon_footprint and n_matched < n_b_slots:
+        return None
+
+    selected_heuristics = [pair_heuristics[(slot_a[u], slot_b[v])] for u, v in enumerate(match_left) if v != -1]
+    return selected_heuristics, [], []
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the matching fast path against the integer program')
+    parser.add_argument('--example_folder', type=str, default="toy_examples")
+    parser.add_argument('--use_v2', action='store_true', default=False)
+    parser.add_argument('--compressed', action='store_true', default=False)
+    parser.add_argument('--time_limit', type=float, default=60, help="time limit of the integer program in seconds")
+    args = parser.parse_args()
+
+    h_functions = heuristic_functions_v2 if args.use_v2 else heuristic_functions
+    design_files = sorted(f for f in os.listdir(args.example_folder) if f.endswith(".json"))
+    for design_A, design_B in itertools.permutations(design_files, 2):
+        ics_a = load_design(os.path.join(args.example_folder, design_A), compressed=args.compressed)
+        ics_b = load_design(os.path.join(args.example_folder, design_B), compressed=args.compressed)
+        kwargs = dict(use_carbon_footprint=False, a_indices=[ic.id for ic in ics_a], b_indices=[ic.id for ic in ics_b],
+                      footprints_a=[ic.Carbon_Footprint for ic in ics_a], footprints_b=[ic.Carbon_Footprint for ic in ics_b],
+                      counts_a=[ic.Count for ic in ics_a], counts_b=[ic.Count for ic in ics_b])
+        for prove_direction in [A_MORE, B_MORE]:
+            heuristics = HeuristicTable(ics_a, ics_b, h_functions).heuristics(prove_direction)
+            start_time = perf_counter()
+            matching_result = select_heuristics_matching(heuristics, prove_direction=prove_direction, **kwargs)
+            matching_time = perf_counter() - start_time
+            start_time = perf_counter()
+            solve_info = {}
+            ilp_result = select_heuristics_cpsat(heuristics, prove_direction=prove_direction, time_limit=args.time_limit,
+                                                 solve_info=solve_info, **kwargs)
+            ilp_time = perf_counter() - start_time
+            print(f"{design_A} vs {design_B} ({'A_MORE' if prove_direction == A_MORE else 'B_MORE'}): "
+                  f"matching covers {len(matching_result[0])} units of B in {matching_time*1e3:.2f} ms, "
+                  f"ILP covers {int(solve_info['objective'])} in {ilp_time*1e3:.2f} ms ({solve_info['status']})")
@@ -2,46 +2,93 @@ from ortools.linear_solver import pywraplp
 import numpy as np
 import os
 import argparse
+from time import perf_counter
+from contextlib import nullcontext
 
 from heuristics import heuristic_functions, heuristic_functions_v2
 from classes import *
+from precompute import HeuristicTable
 from utils import *
 
+SOLVER_STATUS_NAMES = {
+    pywraplp.Solver.OPTIMAL: "OPTIMAL",
+    pywraplp.Solver.FEASIBLE: "FEASIBLE",
+    pywraplp.Solver.INFEASIBLE: "INFEASIBLE",
+    pywraplp.Solver.UNBOUNDED: "UNBOUNDED",
+    pywraplp.Solver.ABNORMAL: "ABNORMAL",
+    pywraplp.Solver.NOT_SOLVED: "NOT_SOLVED",
+}
+
+# Index of heuristics keyed on the parts they compare. Parts are keyed as sorted tuples, so set-heuristics
+# (e.g. user-defined rules) only conflict with heuristics over exactly the same parts.
+# Built in one pass; later solves can query is_conflicting for any heuristic.
+class ConflictIndex:
+    def __init__(self, heuristics=[]):
+        self.heuristics = []
+        self.directions = {} # key -> set of directions
+        self.h_ids = {} # key -> ids of the heuristics in self.heuristics
+        self.add(heuristics)
+
+    @staticmethod
+    def key(h):
+        return (tuple(sorted(h.parts_a)), tuple(sorted(h.parts_b)))
+
+    def add(self, heuristics):
+        for h in heuristics:
+            if h.direction == NOT_SURE:
+                self.heuristics.append(h)
+                continue
+            key = self.key(h)
+            self.directions.setdefault(key, set()).add(h.direction)
+            self.h_ids.setdefault(key, []).append(len(self.heuristics))
+            self.heuristics.append(h)
+
+    # a heuristic conflicts if the index holds a counterexample, i.e. a heuristic over the same parts with the opposite direction
+    def is_conflicting(self, h):
+        if h.direction == NOT_SURE:
+            return False
+        return -h.direction in self.directions.get(self.key(h), ())
+
+    def conflicting_ids(self):
+        return [h_i for h_i, h in enumerate(self.heuristics) if self.is_conflicting(h)]
+
+    # list of pairs of conflicting heuristic ids
+    def conflicting_pairs(self):
+        conflicting_h_ids = []
+        for h_i in self.conflicting_ids():
+            h = self.heuristics[h_i]
+            for counter_h_i in self.h_ids[self.key(h)]:
+                if self.heuristics[counter_h_i].direction == -h.direction:
+                    conflicting_h_ids.append([h_i, counter_h_i])
+        return conflicting_h_ids
+
 # return a list of pairs of conflicting heuristic ids
 def conflicting_heuristics(heuristics):
-    conflicting_h_ids = []
-    # ignore all heuristics for which we can find a counterexample heuristic
-    # TODO: make this robust to Sets when we will have Set-heuristics
-    for h_i, h in enumerate(heuristics):
-        if h.direction == NOT_SURE:
-            continue
-        for counter_h_i, counter_h in enumerate(heuristics):
-            if h_i == counter_h_i or counter_h.direction == NOT_SURE:
-                continue
-            if h.parts_a[0] == counter_h.parts_a[0] and h.parts_b[0] == counter_h.parts_b[0] and h.direction == -counter_h.direction:
-                conflicting_h_ids.append([h_i, counter_h_i])
-    return conflicting_h_ids
+    return ConflictIndex(heuristics).conflicting_pairs()
+
+# how many times a heuristic can be applied given the number of units of its parts
+def max_applications(h, counts_a, counts_b):
+    return min([counts_a[a_i]//h.parts_a.count(a_i) for a_i in h.parts_a] +
+               [counts_b[b_i]//h.parts_b.count(b_i) for b_i in h.parts_b])
 
 # proof_direction = A_MORE if we want to show that A > B.
 # right now, we should just switch the designs
+# counts_a/counts_b give the number of units behind each part id (compressed designs, see utils.load_design);
+# they default to one unit per id, which gives the original binary program.
+# conflict_index can be passed in to reuse a ConflictIndex across solves
+# solve_info (a dict) receives the solver status, objective, wall time and model size
 def select_heuristics(heuristics, filter_out_conflicts=True, prove_direction=A_MORE, use_carbon_footprint=True,
-                      a_indices=[], b_indices=[], footprints_a=[], footprints_b=[]):
+                      a_indices=[], b_indices=[], footprints_a=[], footprints_b=[], counts_a=None, counts_b=None,
+                      conflict_index=None, solve_info=None):
     prob = pywraplp.Solver.CreateSolver('SAT_INTEGER_PROGRAMMING')
     prob.SuppressOutput()
     if not prob:
         print("The OR-Tools solver could not be created. Check your installation")
         exit()
-    #print(a_indices)
-    #print(b_indices)
-    b_variables = [prob.IntVar(0,1,"b_"+str(i)) for i in b_indices]
-    #print(b_variables)
-    h_indices = list(range(len(heuristics)))
-    #print(h_indices)
-    h_variables = [prob.IntVar(0,1,"h_"+str(i)) for i in h_indices]
-    #print(h_variables)
-    if use_carbon_footprint:
-        ca_variables = [prob.IntVar(0,1,"ca_"+str(i)) for i in a_indices]
-        cb_variables = [prob.IntVar(0,1,"cb_"+str(i)) for i in b_indices]
+    if counts_a is None:
+        counts_a = [1]*len(a_indices)
+    if counts_b is None:
+        counts_b = [1]*len(b_indices)
 
     # Filter out conflicting heuristics
     ignore_h_ids = []
@@ -49,51 +96,52 @@ def select_heuristics(heuristics, filter_out_conflicts=True, prove_direction=A_M
         if h.direction != prove_direction:
             ignore_h_ids.append(h_i)
     if filter_out_conflicts:
-        conflicting_h_ids = conflicting_heuristics(heuristics)
-        ignore_h_ids += [c[0] for c in conflicting_h_ids]
-    ignore_h_ids = np.unique(ignore_h_ids)
-    #print("Filtered out heuristics:")
-    #print(ignore_h_ids)
+        if conflict_index is None:
+            conflict_index = ConflictIndex(heuristics)
+        ignore_h_ids += [h_i for h_i, h in enumerate(heuristics) if conflict_index.is_conflicting(h)]
+    ignore_h_ids = set(ignore_h_ids)
+
+    # b_i counts the covered units of part b_i, h_i how many times heuristic h_i is applied
+    b_variables = [prob.IntVar(0,counts_b[i],"b_"+str(i)) for i in b_indices]
+    h_variables = []
+    # number of units of each part used by one application of a heuristic
+    a_coefficients = [{} for _ in a_indices]
+    b_coefficients = [{} for _ in b_indices]
+    for h_i, h in enumerate(heuristics):
+        if h.user_defined:
+            # Turn on all user-defined heuristics
+            h_variables.append(prob.IntVar(1,1,"h_"+str(h_i)))
+        elif h_i in ignore_h_ids:
+            # Turn off all ignored heuristics (except user-defined ones)
+            h_variables.append(prob.IntVar(0,0,"h_"+str(h_i)))
+            continue
+        else:
+            h_variables.append(prob.IntVar(0,max_applications(h, counts_a, counts_b),"h_"+str(h_i)))
+        for a_i in h.parts_a:
+            a_coefficients[a_i][h_i] = a_coefficients[a_i].get(h_i, 0) + 1
+        for b_i in h.parts_b:
+            b_coefficients[b_i][h_i] = b_coefficients[b_i].get(h_i, 0) + 1
+    if use_carbon_footprint:
+        ca_variables = [prob.IntVar(0,counts_a[i],"ca_"+str(i)) for i in a_indices]
+        cb_variables = [prob.IntVar(0,counts_b[i],"cb_"+str(i)) for i in b_indices]
 
     # add constraints
-    # 1) Each a_i can only be used once
+    # 1) Each unit of a_i can only be used once
     for a_i in a_indices:
-        a_i_sum = []
-        for h_i, h in enumerate(heuristics):
-            if filter_out_conflicts and h_i in ignore_h_ids and not heuristics[h_i].user_defined:
-                continue
-            if a_i in h.parts_a:
-                a_i_sum.append(h_variables[h_i])
-        #print(a_i_sum)
+        a_i_sum = [coefficient*h_variables[h_i] for h_i, coefficient in a_coefficients[a_i].items()]
         if use_carbon_footprint:
-            prob.Add(sum(a_i_sum) <= 1 - ca_variables[a_i])
+            prob.Add(sum(a_i_sum) <= counts_a[a_i] - ca_variables[a_i])
         else:
-            prob.Add(sum(a_i_sum) <= 1)
+            prob.Add(sum(a_i_sum) <= counts_a[a_i])
 
-    # 2) Count b_i only if we have at least one heuristic for it
+    # 2) Count units of b_i only if we have heuristics for them
     for b_i in b_indices:
-        b_i_sum = []
-        for h_i, h in enumerate(heuristics):
-            if filter_out_conflicts and h_i in ignore_h_ids and not heuristics[h_i].user_defined:
-                continue
-            if b_i in h.parts_b:
-                b_i_sum.append(h_variables[h_i])
-        #print(b_i_sum)
+        b_i_sum = [coefficient*h_variables[h_i] for h_i, coefficient in b_coefficients[b_i].items()]
         if use_carbon_footprint:
             prob.Add(b_variables[b_i] <= sum(b_i_sum) + cb_variables[b_i])
         else:
             prob.Add(b_variables[b_i] <= sum(b_i_sum))
 
-    # Turn off all ignored heuristics (except user-defined ones)
-    for h_i in ignore_h_ids:
-        if heuristics[h_i].user_defined:
-            continue
-        prob.Add(h_variables[h_i] == 0)
-    # Turn on all user-defined heuristics
-    for h_i in range(len(heuristics)):
-        if heuristics[h_i].user_defined:
-            prob.Add(h_variables[h_i] == 1)
-
     # the carbon footprint of A should be greater than the carbon footprint of B
     if use_carbon_footprint:
         footprint_a = 0
@@ -101,16 +149,12 @@ def select_heuristics(heuristics, filter_out_conflicts=True, prove_direction=A_M
             if footprints_a[a_i] == None:
                 prob.Add(ca_variables[a_i] == 0)
             else:
-                #print(footprints_a[a_i])
-                #print(ca_variables[a_i])
                 footprint_a += footprints_a[a_i]*ca_variables[a_i]
         footprint_b = 0
         for b_i in b_indices:
             if footprints_b[b_i] == None:
                 prob.Add(cb_variables[b_i] == 0)
             else:
-                #print(footprints_b[b_i])
-                #print(cb_variables[b_i])
                 footprint_b += footprints_b[b_i]*cb_variables[b_i]
         if prove_direction == A_MORE:
             prob.Add(footprint_a >= footprint_b)
@@ -121,43 +165,185 @@ def select_heuristics(heuristics, filter_out_conflicts=True, prove_direction=A_M
     obj_expr = sum(b_variables)
     # print(prob.NumVariables(), "variables created")
     # print(len(heuristics), "heuristics available")
-    # print(len(b_variables) + len(h_variables) + len(ca_variables) + len(cb_variables), "integer variables created")
     # print(prob.NumConstraints(), "constraints created")
     # print(len(a_indices), "parts in A")
     # print(len(b_indices), "parts in B")
 
     prob.Maximize(obj_expr)
     # prob.SetNumThreads(8)
+    start_time = perf_counter()
     status = prob.Solve()
+    if solve_info is not None:
+        solve_info["status"] = SOLVER_STATUS_NAMES.get(status, str(status))
+        solve_info["objective"] = prob.Objective().Value()
+        solve_info["best_bound"] = prob.Objective().BestBound()
+        solve_info["wall_time"] = perf_counter() - start_time
+        solve_info["variables"] = prob.NumVariables()
+        solve_info["constraints"] = prob.NumConstraints()
     if status == pywraplp.Solver.OPTIMAL or status == pywraplp.Solver.FEASIBLE:
-        #print("Solver status:", status)
         best_obj = prob.Objective().Value()
-        #print("best_obj value", best_obj)
-        # print("Selected variables")
-        #print("b_variables")
-        #for v in b_variables:
-        #    if np.isclose(v.solution_value(), 1.0):
-        #        print(v, v.solution_value())
-        #print("h_variables")
     else:
         raise Exception("Solver status:", status)
 
+    # a heuristic (or footprint) used on several units appears once per unit
     selected_heuristics = []
-    for v in h_variables:
-        if np.isclose(v.solution_value(), 1.0):
-            selected_heuristics.append(heuristics[int(v.name().split("_")[1])])
+    for h_i, v in enumerate(h_variables):
+        selected_heuristics += [heuristics[h_i]]*int(round(v.solution_value()))
     selected_footprints_a = []
     selected_footprints_b = []
     if use_carbon_footprint:
-        for v in ca_variables:
-            if np.isclose(v.solution_value(), 1.0):
-                selected_footprints_a.append(int(v.name().split("_")[1]))
-        for v in cb_variables:
-            if np.isclose(v.solution_value(), 1.0):
-                selected_footprints_b.append(int(v.name().split("_")[1]))
+        for a_i, v in zip(a_indices, ca_variables):
+            selected_footprints_a += [a_i]*int(round(v.solution_value()))
+        for b_i, v in zip(b_indices, cb_variables):
+            selected_footprints_b += [b_i]*int(round(v.solution_value()))
 
     return selected_heuristics, selected_footprints_a, selected_footprints_b
 
+# Same program as select_heuristics, but the model is kept alive between solves (e.g. interactive UI updates).
+# All generated heuristics of both directions get a column once; a solve only changes variable bounds
+# (prove direction, carbon footprint on/off, removed user rules) and adds columns for new user rules.
+# The previous solution is used as a hint for the next solve.
+class SolverSession:
+    def __init__(self, heuristics, a_indices, b_indices, footprints_a, footprints_b, counts_a=None, counts_b=None,
+                 filter_out_conflicts=True, conflict_index=None):
+        self.prob = pywraplp.Solver.CreateSolver('SAT_INTEGER_PROGRAMMING')
+        if not self.prob:
+            raise RuntimeError("The OR-Tools solver could not be created. Check your installation")
+        self.prob.SuppressOutput()
+        self.a_indices = a_indices
+        self.b_indices = b_indices
+        self.footprints_a = footprints_a
+        self.footprints_b = footprints_b
+        self.counts_a = counts_a if counts_a is not None else [1]*len(a_indices)
+        self.counts_b = counts_b if counts_b is not None else [1]*len(b_indices)
+        infinity = self.prob.infinity()
+
+        if filter_out_conflicts:
+            if conflict_index is None:
+                conflict_index = ConflictIndex(heuristics)
+            heuristics = [h for h in heuristics if not conflict_index.is_conflicting(h)]
+        self.heuristics = [h for h in heuristics if h.direction != NOT_SURE]
+        self.user_heuristics = [] # every user-defined heuristic seen so far, in order of their columns
+        self.user_variables = {} # user-defined heuristic -> its variable
+
+        self.b_variables = [self.prob.IntVar(0,self.counts_b[i],"b_"+str(i)) for i in b_indices]
+        self.h_variables = [self.prob.IntVar(0,max_applications(h, self.counts_a, self.counts_b),"h_"+str(h_i))
+                            for h_i, h in enumerate(self.heuristics)]
+        self.ca_variables = [self.prob.IntVar(0,self.counts_a[i],"ca_"+str(i)) for i in a_indices]
+        self.cb_variables = [self.prob.IntVar(0,self.counts_b[i],"cb_"+str(i)) for i in b_indices]
+
+        # 1) Each unit of a_i can only be used once: sum(h) + ca_i <= count_a_i
+        self.a_constraints = [self.prob.Constraint(-infinity, self.counts_a[a_i]) for a_i in a_indices]
+        for a_i in a_indices:
+            self.a_constraints[a_i].SetCoefficient(self.ca_variables[a_i], 1)
+        # 2) Count units of b_i only if we have heuristics for them: b_i - sum(h) - cb_i <= 0
+        self.b_constraints = [self.prob.Constraint(-infinity, 0) for b_i in b_indices]
+        for b_i in b_indices:
+            self.b_constraints[b_i].SetCoefficient(self.b_variables[b_i], 1)
+            self.b_constraints[b_i].SetCoefficient(self.cb_variables[b_i], -1)
+        for h, v in zip(self.heuristics, self.h_variables):
+            self._add_column(h, v)
+        # footprint_a - footprint_b, its bounds are set by the prove direction
+        self.footprint_constraint = self.prob.Constraint(-infinity, infinity)
+        for a_i in a_indices:
+            if footprints_a[a_i] is not None:
+                self.footprint_constraint.SetCoefficient(self.ca_variables[a_i], footprints_a[a_i])
+        for b_i in b_indices:
+            if footprints_b[b_i] is not None:
+                self.footprint_constraint.SetCoefficient(self.cb_variables[b_i], -footprints_b[b_i])
+
+        objective = self.prob.Objective()
+        for v in self.b_variables:
+            objective.SetCoefficient(v, 1)
+        objective.SetMaximization()
+        self.last_solution = None
+
+    def _add_column(self, h, variable):
+        for a_i in h.parts_a:
+            row = self.a_constraints[a_i]
+            row.SetCoefficient(variable, row.GetCoefficient(variable) + 1)
+        for b_i in h.parts_b:
+            row = self.b_constraints[b_i]
+            row.SetCoefficient(variable, row.GetCoefficient(variable) - 1)
+
+    def _set_user_heuristics(self, user_heuristics):
+        active = set(user_heuristics)
+        for h in active:
+            if h not in self.user_variables:
+                variable = self.prob.IntVar(1,1,"u_"+str(len(self.user_heuristics)))
+                self._add_column(h, variable)
+                self.user_variables[h] = variable
+                self.user_heuristics.append(h)
+        # Turn on all active user-defined heuristics, turn off the ones that were removed
+        for h in self.user_heuristics:
+            self.user_variables[h].SetBounds(int(h in active), int(h in active))
+
+    # time_limit in seconds, solve_info (a dict) receives the solver status and wall time;
+    # cancelling cancel_token (cancellation.CancelToken) interrupts the solve, which then raises cancellation.Cancelled.
+    # num_workers: search workers of the SAT solver. The solver default is one worker per core, and a single worker
+    # can take tens of seconds on a toy pair (Leonardo vs MKR Fox, A_MORE with the footprint) that the parallel
+    # portfolio of 8 workers solves in about 50 ms, even on one core.
+    def solve(self, prove_direction=A_MORE, use_carbon_footprint=True, user_heuristics=[], time_limit=None, solve_info=None,
+              cancel_token=None, num_workers=8):
+        infinity = self.prob.infinity()
+        self._set_user_heuristics(user_heuristics)
+        # only heuristics proving the requested direction can be used
+        for h, v in zip(self.heuristics, self.h_variables):
+            v.SetUb(max_applications(h, self.counts_a, self.counts_b) if h.direction == prove_direction else 0)
+        for a_i, v in zip(self.a_indices, self.ca_variables):
+            v.SetUb(self.counts_a[a_i] if use_carbon_footprint and self.footprints_a[a_i] is not None else 0)
+        for b_i, v in zip(self.b_indices, self.cb_variables):
+            v.SetUb(self.counts_b[b_i] if use_carbon_footprint and self.footprints_b[b_i] is not None else 0)
+        # the carbon footprint of A should be greater than the carbon footprint of B
+        if use_carbon_footprint and prove_direction == A_MORE:
+            self.footprint_constraint.SetBounds(0, infinity)
+        elif use_carbon_footprint and prove_direction == B_MORE:
+            self.footprint_constraint.SetBounds(-infinity, 0)
+        else:
+            self.footprint_constraint.SetBounds(-infinity, infinity)
+
+        # warm start from the previous solution (new user columns are left to the solver)
+        if self.last_solution is not None:
+            variables, values = zip(*self.last_solution.items())
+            self.prob.SetHint(list(variables), list(values))
+
+        # set on every solve, the session is reused by later runs (0 is no limit)
+        self.prob.SetTimeLimit(0 if time_limit is None else max(1, int(time_limit*1000)))
+        self.prob.SetNumThreads(num_workers)
+        if cancel_token is not None:
+            cancel_token.check() # setting up the model takes a while
+        start_time = perf_counter()
+        with cancel_token.interrupting(self.prob.InterruptSolve) if cancel_token is not None else nullcontext():
+            status = self.prob.Solve()
+        if solve_info is not None:
+            solve_info["status"] = SOLVER_STATUS_NAMES.get(status, str(status))
+            solved = status == pywraplp.Solver.OPTIMAL or status == pywraplp.Solver.FEASIBLE
+            solve_info["objective"] = self.prob.Objective().Value() if solved else None
+            solve_info["best_bound"] = self.prob.Objective().BestBound() if solved else None
+            solve_info["wall_time"] = perf_counter() - start_time
+            solve_info["variables"] = self.prob.NumVariables()
+            solve_info["constraints"] = self.prob.NumConstraints()
+        if cancel_token is not None:
+            cancel_token.check()
+        if status != pywraplp.Solver.OPTIMAL and status != pywraplp.Solver.FEASIBLE:
+            raise RuntimeError(f"Solver status: {SOLVER_STATUS_NAMES.get(status, status)}")
+        all_variables = self.b_variables + self.h_variables + self.ca_variables + self.cb_variables
+        self.last_solution = {v: v.solution_value() for v in all_variables}
+
+        # a heuristic (or footprint) used on several units appears once per unit
+        selected_heuristics = []
+        for h, v in zip(self.heuristics, self.h_variables):
+            selected_heuristics += [h]*int(round(v.solution_value()))
+        for h in self.user_heuristics:
+            selected_heuristics += [h]*int(round(self.user_variables[h].solution_value()))
+        selected_footprints_a = []
+        selected_footprints_b = []
+        for a_i, v in zip(self.a_indices, self.ca_variables):
+            selected_footprints_a += [a_i]*int(round(v.solution_value()))
+        for b_i, v in zip(self.b_indices, self.cb_variables):
+            selected_footprints_b += [b_i]*int(round(v.solution_value()))
+        return selected_heuristics, selected_footprints_a, selected_footprints_b
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description='Integer program for LCA-for-PCB')
@@ -177,12 +363,8 @@ if __name__ == "__main__":
     ics_b = load_design(os.path.join(args.example_folder, args.design_B))
 
     # pre-compute heuristics
-    heuristics = []
     h_functions = heuristic_functions_v2 if args.use_v2 else heuristic_functions
-    for i, ic_a in enumerate(ics_a):
-        for j, ic_b in enumerate(ics_b):
-            for h in h_functions:
-                heuristics.append(Heuristic(ic_a, ic_b, h))
+    heuristics = HeuristicTable(ics_a, ics_b, h_functions).heuristics()
 
     print("Binary Integer Program:")
     # construct variables
@@ -0,0 +1,112 @@
+import numpy as np
+
+from classes import *
+from heuristics import *
+
+# numeric attributes of an IC that the heuristics look at
+COLUMNS = ["Die_Size", "Power_Consumption", "Min_Package_Size", "Process_Node"]
+
+class DesignColumns:
+    # Column (struct-of-arrays) view of a design: one float64 array per attribute, NaN where unknown
+    def __init__(self, ics):
+        self.ics = list(ics)
+        self.ids = np.array([ic.id for ic in self.ics], dtype=np.int64)
+        self.columns = {}
+        self.masks = {}
+        for column in COLUMNS:
+            values = np.array([np.nan if getattr(ic, column) is None else getattr(ic, column) for ic in self.ics],
+                              dtype=np.float64)
+            self.columns[column] = values
+            self.masks[column] = ~np.isnan(values)
+
+    def __len__(self):
+        return len(self.ics)
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+def _sign_directions(values_a, values_b):
+    # A_MORE where a > b, B_MORE where a < b, NOT_SURE where equal or unknown
+    with np.errstate(invalid="ignore"):
+        diff = values_a[:, None] - values_b[None, :]
+    directions = np.zeros(diff.shape, dtype=np.int8)
+    directions[diff > 0] = A_MORE
+    directions[diff < 0] = B_MORE
+    return directions
+
+def vectorized_die_size(cols_a, cols_b):
+    return _sign_directions(cols_a["Die_Size"], cols_b["Die_Size"])
+
+def vectorized_process_node(cols_a, cols_b):
+    # a bigger process node is less advanced, so the direction is flipped
+    return -_sign_directions(cols_a["Process_Node"], cols_b["Process_Node"])
+
+def vectorized_power_consumption(cols_a, cols_b):
+    return _sign_directions(cols_a["Power_Consumption"], cols_b["Power_Consumption"])
+
+def vectorized_package_size(cols_a, cols_b):
+    return _sign_directions(cols_a["Min_Package_Size"], cols_b["Min_Package_Size"])
+
+def vectorized_effective_die_size(cols_a, cols_b):
+    node_a = cols_a["Process_Node"][:, None]
+    node_b = cols_b["Process_Node"][None, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        process_node_ratio = np.where(node_a == node_b, 1.0, nm_compare(node_a, node_b))
+        effective_die_size = cols_a["Die_Size"][:, None] * process_node_ratio
+        diff = effective_die_size - cols_b["Die_Size"][None, :]
+    directions = np.zeros(diff.shape, dtype=np.int8)
+    directions[diff > 0] = A_MORE
+    directions[diff < 0] = B_MORE
+    return directions
+
+# broadcasting counterpart of each scalar heuristic function in heuristics.py
+vectorized_heuristic_functions = {
+    Compare_Die_Size: vectorized_die_size,
+    Compare_Process_Node: vectorized_process_node,
+    Compare_Power_Consumption: vectorized_power_consumption,
+    Compare_Package_Size: vectorized_package_size,
+    Compare_Effective_Die_Size: vectorized_effective_die_size,
+}
+
+def _scalar_directions(h_function, cols_a, cols_b):
+    # fallback for heuristic functions without a vectorized counterpart
+    directions = np.zeros((len(cols_a), len(cols_b)), dtype=np.int8)
+    for i, ic_a in enumerate(cols_a.ics):
+        for j, ic_b in enumerate(cols_b.ics):
+            directions[i, j] = h_function(ic_a, ic_b)[0]
+    return directions
+
+class HeuristicTable:
+    # Direction matrices of shape (|H|, |A|, |B|) for all pairs of ICs and heuristic functions.
+    # Heuristic objects (and their explanation strings) are only created for the cells that are asked for.
+    def __init__(self, design_A, design_B, h_functions):
+        self.cols_a = design_A if isinstance(design_A, DesignColumns) else DesignColumns(design_A)
+        self.cols_b = design_B if isinstance(design_B, DesignColumns) else DesignColumns(design_B)
+        self.h_functions = list(h_functions)
+        self.directions = np.zeros((len(self.h_functions), len(self.cols_a), len(self.cols_b)), dtype=np.int8)
+        for h_i, h_function in enumerate(self.h_functions):
+            if h_function in vectorized_heuristic_functions:
+                self.directions[h_i] = vectorized_heuristic_functions[h_function](self.cols_a, self.cols_b)
+            else:
+                self.directions[h_i] = _scalar_directions(h_function, self.cols_a, self.cols_b)
+        # a pair (a, b) is conflicting if one heuristic says A_MORE and another one says B_MORE
+        self.conflicts = (self.directions == A_MORE).any(axis=0) & (self.directions == B_MORE).any(axis=0)
+
+    def mask(self, prove_direction=None, filter_out_conflicts=False):
+        if prove_direction is None:
+            mask = self.directions != NOT_SURE
+        else:
+            mask = self.directions == prove_direction
+        if filter_out_conflicts:
+            mask &= ~self.conflicts[None, :, :]
+        return mask
+
+    def count(self, prove_direction=None, filter_out_conflicts=False):
+        return int(np.count_nonzero(self.mask(prove_direction, filter_out_conflicts)))
+
+    def heuristics(self, prove_direction=None, filter_out_conflicts=False):
+        # Heuristic objects for all cells with a direction (restricted to prove_direction if given)
+        # same ordering as the (ic_a, ic_b, heuristic_function) loops this replaces
+        a_indices, b_indices, h_indices = np.nonzero(self.mask(prove_direction, filter_out_conflicts).transpose(1, 2, 0))
+        return [Heuristic(self.cols_a.ics[i], self.cols_b.ics[j], self.h_functions[h_i], direction=int(self.directions[h_i, i, j]))
+                for i, j, h_i in zip(a_indices.tolist(), b_indices.tolist(), h_indices.tolist())]
@@ -1,57 +1,122 @@
 import json
+import logging
+import argparse
+import numpy as np
+from functools import lru_cache
 
-# Unit: gram CO2 eq. / piece
-resistor_carbon_database = {
-    "0201"  : 0.01,
-    "0402"  : 0.04,
-    "0603"  : 0.12,
-    "0805"  : 0.36,
-    "1206"  : 0.6,
-}
-
-capacitor_carbon_database = {
-    "0201"  : 0.03589,
-    "0402"  : 0.1455,
-    "0603"  : 0.6111,
-    "0805"  : 1.067,
-}
-
-inductor_carbon_database = {
-    "0201"  : 0.02231,
-    "0402"  : 0.0776,
-    "0603"  : 0.3298,
-    "0805"  : 1.358,
-}
-
-# Unit: gram CO2 eq. / mm^2 / layer / 1mm thickness
-fr4_carbon_database = 0.006125
+from emission_factors import default_index
+
+logger = logging.getLogger(__name__)
+
+# part types whose counts by package size (e.g. {"resistor": {"0402": 26}}) are read from a design summary,
+# each with its table lca_data/passive/<type>.json (gram CO2 eq. / piece by imperial size code)
+PASSIVE_TYPES = ["resistor", "capacitor", "inductor", "transistor", "crystal", "connector"]
+# an imperial size code gives length and width in hundredths of an inch, e.g. "0603" is 0.06" x 0.03",
+# except the 5-digit "01005" which is in thousandths (0.010" x 0.005")
+MM_PER_SIZE_UNIT = 0.254
+MM_PER_THOU = 0.0254
+SMALL_SIZE_CODES = {"01005": (10 * MM_PER_THOU, 5 * MM_PER_THOU)} # length, width in mm
+
+def package_areas(size_codes):
+    # area in mm^2 of each imperial size code, NaN for codes that cannot be read or have no area (e.g. "0100")
+    areas = np.full(len(size_codes), np.nan)
+    for i, code in enumerate(size_codes):
+        if code in SMALL_SIZE_CODES:
+            length, width = SMALL_SIZE_CODES[code]
+            areas[i] = length * width
+        elif len(code) == 4 and code.isdigit():
+            areas[i] = int(code[:2]) * MM_PER_SIZE_UNIT * int(code[2:]) * MM_PER_SIZE_UNIT
+    areas[areas <= 0] = np.nan
+    return areas
+
+class PassiveTable:
+    # footprint of one part type by package size: the listed sizes as they are, other sizes interpolated
+    # linearly in log-log space by package area between the two closest listed sizes. Sizes smaller or larger than
+    # every listed size are not extrapolated, they have no footprint (NaN) and are reported as unknown parts
+    def __init__(self, factors):
+        self.factors = factors
+        codes = list(factors)
+        areas = package_areas(codes)
+        order = np.argsort(areas)
+        self.log_areas = np.log(areas[order])
+        self.log_factors = np.log(np.array([factors[code] for code in codes])[order])
+
+    def lookup(self, size_codes):
+        # footprint of each size code, NaN where the size code cannot be read or is out of the range of the table
+        values = np.array([self.factors.get(code, np.nan) for code in size_codes], dtype=np.float64)
+        missing = np.flatnonzero(np.isnan(values))
+        if len(missing) == 0:
+            return values
+        # size codes without an area stay NaN and are reported as parts without a footprint
+        x = np.log(package_areas([size_codes[i] for i in missing]))
+        xs, ys = self.log_areas, self.log_factors
+        y = np.interp(x, xs, ys)
+        y[(x < xs[0]) | (x > xs[-1])] = np.nan
+        values[missing] = np.exp(y)
+        return values
+
+class PassiveDatabase:
+    # tables: part type -> PassiveTable, board_factor: gram CO2 eq. / mm^2 / layer / 1mm thickness
+    def __init__(self, tables, board_factor):
+        self.tables = tables
+        self.board_factor = board_factor
+
+    # the passive and board tables of an emission_factors.EmissionFactorIndex
+    @classmethod
+    def from_index(cls, index):
+        tables = {part_type: PassiveTable(index[f"passive/{part_type}"].to_dict())
+                  for part_type in PASSIVE_TYPES if f"passive/{part_type}" in index.tables}
+        return cls(tables, index["pcb/fr4_board"]["FR-4"])
+
+    # (board footprints, non-IC footprints) of design summaries, as arrays in gram CO2 eq.
+    def footprints(self, designs):
+        boards = [data["board"] for data in designs]
+        areas = np.array([board["Size"]["Length"] * board["Size"]["Width"] for board in boards], dtype=np.float64)
+        layers = np.array([board["Number_of_Layers"] for board in boards], dtype=np.float64)
+        board_footprints = self.board_factor * areas * layers
+
+        non_ic_footprints = np.zeros(len(designs))
+        unknown = {} # (part type, size code) -> count of the parts without a footprint
+        for part_type in PASSIVE_TYPES:
+            rows = [(d, size, count) for d, data in enumerate(designs) for size, count in data.get(part_type, {}).items()]
+            if not rows:
+                continue
+            design_indices, sizes, counts = zip(*rows)
+            counts = np.array(counts, dtype=np.float64)
+            if part_type in self.tables:
+                unique_sizes, inverse = np.unique(np.array(sizes, dtype=str), return_inverse=True)
+                factors = self.tables[part_type].lookup(unique_sizes.tolist())[inverse]
+            else:
+                factors = np.full(len(rows), np.nan)
+            known = ~np.isnan(factors)
+            non_ic_footprints += np.bincount(np.array(design_indices)[known], weights=factors[known] * counts[known],
+                                             minlength=len(designs))
+            for i in np.flatnonzero(~known).tolist():
+                unknown[(part_type, sizes[i])] = unknown.get((part_type, sizes[i]), 0) + int(counts[i])
+        if unknown:
+            logger.warning("No carbon footprint for %s", ", ".join(f"{count} x {part_type} {size}"
+                                                                   for (part_type, size), count in unknown.items()))
+        return board_footprints, non_ic_footprints
+
+@lru_cache(maxsize=None)
+def default_database():
+    # the database in lca_data, loaded once
+    return PassiveDatabase.from_index(default_index())
 
 def get_nonIC_carbon_footprint(data):
-    # Calculate total carbon emissions for components
-    total_carbon_emission = 0.0
-
-    for part, sizes in data.items():
-        if part in ["resistor", "capacitor", "inductor"]:
-            for size, count in sizes.items():
-                if size in eval(f"{part}_carbon_database"):
-                    part_carbon_emission = eval(f"{part}_carbon_database[size]") * count
-                    total_carbon_emission += part_carbon_emission
-                    print(f"{part} {size} {count}: {part_carbon_emission} gram CO2 eq.")
-            print(f"total carbon emission after {part}: {total_carbon_emission} gram CO2 eq.")
-
-    # Calculate carbon emissions for the board
-    board_size = data["board"]["Size"]
-    board_area = board_size["Length"] * board_size["Width"]
-    board_layers = data["board"]["Number_of_Layers"]
-    print(f"board area: {board_area} mm^2, board layers: {board_layers}")
-    board_carbon_emission = fr4_carbon_database * board_area * board_layers
-    total_carbon_emission += board_carbon_emission
-
-    print(f"Total Carbon Emission: {total_carbon_emission} gram CO2 eq.")
-    return board_carbon_emission, total_carbon_emission - board_carbon_emission
+    # (board footprint, footprint of the non-IC parts) of a design summary, in gram CO2 eq.
+    board_footprints, non_ic_footprints = default_database().footprints([data])
+    return float(board_footprints[0]), float(non_ic_footprints[0])
 
 if __name__ == "__main__":
-    # Read the input JSON file
-    with open("PCB_summary_Leonardo_Rev3d.json", "r") as json_file:
-        data = json.load(json_file)
-    get_nonIC_carbon_footprint(data)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Carbon footprint of the board and the non-IC parts of design summaries')
+    parser.add_argument('designs', nargs='+', help="design summary .json files")
+    args = parser.parse_args()
+    designs = []
+    for fpath in args.designs:
+        with open(fpath, "r") as json_file:
+            designs.append(json.load(json_file))
+    board_footprints, non_ic_footprints = default_database().footprints(designs)
+    for fpath, board_footprint, non_ic_footprint in zip(args.designs, board_footprints, non_ic_footprints):
+        print(f"{fpath}: board {board_footprint:.4f}, non-IC parts {non_ic_footprint:.4f}, "
+              f"total {board_footprint + non_ic_footprint:.4f} gram CO2 eq.")
@@ -0,0 +1,51 @@
+import json
+from time import perf_counter
+from contextlib import contextmanager
+
+# Measurements of one ComparativeLCA.run: phase durations (seconds), counts (heuristics, model size)
+# and what the solver reported (status, objective, wall time, ...)
+class RunStats:
+    def __init__(self, **context):
+        self.context = context # e.g. prove direction and backend of the run
+        self.phases = {}
+        self.counts = {}
+        self.solver = {}
+
+    @contextmanager
+    def phase(self, name):
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + perf_counter() - start_time
+
+    def to_dict(self):
+        return {"context": self.context, "phases": self.phases, "counts": self.counts, "solver": self.solver}
+
+    def __str__(self) -> str:
+        return json.dumps(self.to_dict())
+
+# appends one JSON line per run to fpath, use it as a stats hook
+class JsonLinesSink:
+    def __init__(self, fpath):
+        self.fpath = fpath
+
+    def __call__(self, stats):
+        with open(self.fpath, "a") as f:
+            f.write(json.dumps(stats.to_dict()) + "\n")
+
+# Calls hook(stats) after every run of comparison inside the with block and collects the stats:
+#     with recording(comparison, JsonLinesSink("runs.jsonl")) as records:
+#         comparison.run(options)
+@contextmanager
+def recording(comparison, hook=None):
+    records = []
+    def record(stats):
+        records.append(stats)
+        if hook is not None:
+            hook(stats)
+    comparison.stats_hooks.append(record)
+    try:
+        yield records
+    finally:
+        comparison.stats_hooks.remove(record)
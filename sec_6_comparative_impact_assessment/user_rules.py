@@ -0,0 +1,221 @@
+import re
+import logging
+from collections import namedtuple
+
+from classes import *
+
+logger = logging.getLogger(__name__)
+
+# User rules state that some parts of design A emit more (">=") or less ("<=") than some parts of design B:
+#   rule       := side comparator side
+#   side       := term ("+" term)*
+#   term       := count "x" name
+#   comparator := ">=" | "<="
+# Tokens are separated by whitespace. A name runs up to the next "+", comparator or the end of the rule, so it can
+# contain spaces, digits and "x", e.g. "2 x LM358 + 1 x ATMEGA 32U4 >= 1 x ESP32". The name is the text of the rule
+# between the single space after "x" and the single space before the next "+" or comparator, so spaces at the start,
+# at the end or doubled inside a part name (e.g. "1 x  ATMEGA32U4RC" for " ATMEGA32U4RC") are kept.
+
+Term = namedtuple("Term", ["count", "name"])
+Token = namedtuple("Token", ["kind", "text", "position"])
+
+COMPARATORS = {">=": A_MORE, "<=": B_MORE}
+
+class RuleSyntaxError(ValueError):
+    def __init__(self, message, text, position):
+        self.message = message
+        self.text = text
+        self.position = position
+        super().__init__(f"{message} at column {position + 1}:\n    {text}\n    {' ' * position}^")
+
+class Rule:
+    # parsed rule: terms of design A (left) and design B (right), direction stated by the comparator
+    def __init__(self, text, left, comparator, right):
+        self.text = text
+        self.left = left
+        self.comparator = comparator
+        self.right = right
+        self.direction = COMPARATORS[comparator]
+
+    def __str__(self) -> str:
+        side = lambda terms: " + ".join(f"{term.count} x {term.name}" for term in terms)
+        return f"{side(self.left)} {self.comparator} {side(self.right)}"
+
+def tokenize(text):
+    tokens = []
+    for match in re.finditer(r"\S+", text):
+        word = match.group()
+        if word in COMPARATORS:
+            kind = "COMPARATOR"
+        elif word == "+":
+            kind = "PLUS"
+        elif word == "x":
+            kind = "TIMES"
+        elif word.isdigit():
+            kind = "COUNT"
+        else:
+            kind = "WORD"
+        tokens.append(Token(kind, word, match.start()))
+    tokens.append(Token("END", "", len(text)))
+    return tokens
+
+class _Parser:
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.i = 0
+
+    def error(self, message, token=None):
+        token = self.tokens[self.i] if token is None else token
+        return RuleSyntaxError(message, self.text, token.position)
+
+    def expect(self, kind, description):
+        token = self.tokens[self.i]
+        if token.kind != kind:
+            found = "end of rule" if token.kind == "END" else f"'{token.text}'"
+            raise self.error(f"Expected {description}, found {found}")
+        self.i += 1
+        return token
+
+    def term(self):
+        count_token = self.expect("COUNT", "a part count")
+        count = int(count_token.text)
+        if count == 0:
+            raise self.error("A part count must be at least 1", count_token)
+        times_token = self.expect("TIMES", "'x'")
+        first = self.i
+        while self.tokens[self.i].kind not in ("PLUS", "COMPARATOR", "END"):
+            self.i += 1
+        if self.i == first:
+            raise self.error("Expected a part name")
+        # the raw text of the name, without the separator after "x" and before the next token
+        start = times_token.position + len(times_token.text) + 1
+        end = self.tokens[self.i].position
+        if self.tokens[self.i].kind != "END" and self.text[end - 1].isspace():
+            end -= 1
+        return Term(count, self.text[start:end])
+
+    def side(self):
+        terms = [self.term()]
+        while self.tokens[self.i].kind == "PLUS":
+            self.i += 1
+            terms.append(self.term())
+        return terms
+
+    def rule(self):
+        left = self.side()
+        comparator = self.expect("COMPARATOR", "'>=' or '<='").text
+        right = self.side()
+        self.expect("END", "'+' or the end of the rule")
+        return Rule(self.text, left, comparator, right)
+
+def parse_rule(text):
+    return _Parser(text).rule()
+
+class _PartPool:
+    # units of a design by part name, in design order: name -> [[ic, number of free units], ...]
+    def __init__(self, design):
+        self.free = {}
+        self.entry_of = {} # IC id -> (name, index of its entry)
+        for ic in design:
+            entries = self.free.setdefault(ic.Name, [])
+            self.entry_of[ic.id] = (ic.Name, len(entries))
+            entries.append([ic, ic.Count])
+        self.start = {name: 0 for name in self.free} # first entry of each name that may still have free units
+
+    # the first free units of each term (an IC appears once per unit taken from it), None if there are not enough;
+    # with consume the units are taken out of the pool (all or nothing)
+    def take(self, terms, consume):
+        components = []
+        used = {} # (name, index of the entry) -> units taken by this call
+        for count, name in terms:
+            entries = self.free.get(name, [])
+            k = self.start.get(name, 0)
+            while count > 0 and k < len(entries):
+                ic, free = entries[k]
+                ntaken = min(count, free - used.get((name, k), 0))
+                if ntaken > 0:
+                    components += [ic] * ntaken
+                    used[(name, k)] = used.get((name, k), 0) + ntaken
+                    count -= ntaken
+                if count > 0:
+                    k += 1
+            if count > 0:
+                return None
+        if consume:
+            self._consume(used)
+        return components
+
+    # takes the units of components (as returned by take) out of the pool
+    def remove(self, components):
+        used = {}
+        for ic in components:
+            used[self.entry_of[ic.id]] = used.get(self.entry_of[ic.id], 0) + 1
+        self._consume(used)
+
+    def _consume(self, used):
+        for (name, k), ntaken in used.items():
+            self.free[name][k][1] -= ntaken
+        for name in set(name for name, _ in used):
+            entries = self.free[name]
+            while self.start[name] < len(entries) and entries[self.start[name]][1] == 0:
+                self.start[name] += 1
+
+def _rule_function(rule):
+    def User_Defined_Rule(IC_A, IC_B):
+        return rule.direction, f"User defined rule: {rule.text}"
+    return User_Defined_Rule
+
+class UserRules:
+    # Binds user rules to the parts of two designs, as user defined Heuristics.
+    # Units of design A are used by at most one rule (in rule order), units of design B can be used by several.
+    # Rule texts are parsed once. The heuristics of the rules are kept per prove direction and, when the rule list
+    # changes, only the rules from the first changed one on are bound again; invalidate() drops everything when
+    # a design changes.
+    def __init__(self, design_A, design_B):
+        self.design_A = design_A
+        self.design_B = design_B
+        self.parsed = {} # rule text -> Rule
+        self.bindings = {} # prove direction -> (rule texts, [Heuristic or None per rule])
+
+    def invalidate(self, design_A=None, design_B=None):
+        if design_A is not None:
+            self.design_A = design_A
+        if design_B is not None:
+            self.design_B = design_B
+        self.bindings = {}
+
+    def parse(self, text):
+        if text not in self.parsed:
+            self.parsed[text] = parse_rule(text)
+        return self.parsed[text]
+
+    # user defined Heuristics of the rules that prove prove_direction, rules with the other comparator are skipped;
+    # raises RuleSyntaxError for a malformed rule and logs a warning for the rules whose parts are not all available
+    def heuristics(self, rule_texts, prove_direction):
+        rules = [rule for rule in map(self.parse, rule_texts) if rule.direction == prove_direction]
+        texts = [rule.text for rule in rules]
+        old_texts, old_heuristics = self.bindings.get(prove_direction, ([], []))
+        nkept = 0
+        while nkept < min(len(texts), len(old_texts)) and texts[nkept] == old_texts[nkept]:
+            nkept += 1
+
+        pool_A = _PartPool(self.design_A)
+        pool_B = _PartPool(self.design_B)
+        heuristics = old_heuristics[:nkept]
+        for h in heuristics:
+            # the design A units taken by the unchanged rules are not free for the following ones
+            if h is not None:
+                pool_A.remove(h.ics_a)
+        for rule in rules[nkept:]:
+            left_components = pool_A.take(rule.left, consume=True)
+            right_components = pool_B.take(rule.right, consume=False) if left_components is not None else None
+            if left_components is None or right_components is None:
+                missing = "design A" if left_components is None else "design B"
+                logger.warning("User rule '%s' is not applied: its parts of %s are not in the design "
+                               "(or already used by a previous rule)", rule.text, missing)
+                heuristics.append(None)
+                continue
+            heuristics.append(Heuristic(left_components, right_components, _rule_function(rule), is_user_defined=True))
+        self.bindings[prove_direction] = (texts, heuristics)
+        return [h for h in heuristics if h is not None]
@@ -1,10 +1,18 @@
 import json
+import logging
+import numpy as np
 from classes import *
 from precompute_carbon_number import get_nonIC_carbon_footprint
+from design_format import ColumnarDesign
+
+logger = logging.getLogger(__name__)
 
 def parse_non_ics(json_data, ic_count):
     # create a dummy IC component for all the non-IC components
     board_footprint, non_IC_footprint = get_nonIC_carbon_footprint(json_data)
+    return non_ic_parts(board_footprint, non_IC_footprint, ic_count)
+
+def non_ic_parts(board_footprint, non_IC_footprint, ic_count):
     board_json = {
             "Name": "Board",
             "Package": f"CO2={board_footprint:.4f}",
@@ -30,8 +38,16 @@ def parse_non_ics2(json_data, ic_count):
         }
     return [IC(non_IC_json, ic_count)]
 
-def load_design(fpath, verbose=False):
-    print("Load design from", fpath)
+def load_design(fpath, verbose=False, compressed=False):
+    # compressed=True keeps one IC per distinct part, with the number of units in IC.Count
+    # .npz files are columnar designs (see design_format), read without parsing the IC attributes again
+    logger.info("Load design from %s", fpath)
+    if fpath.endswith(".npz"):
+        design = ColumnarDesign.load(fpath)
+        if verbose:
+            print(design.to_json_data())
+        ics = design.ics(compressed)
+        return ics + non_ic_parts(design.board_footprint, design.non_ic_footprint, len(ics))
     with open(fpath, "r") as f:
         json_data = json.load(f)
     if verbose:
@@ -39,68 +55,84 @@ def load_design(fpath, verbose=False):
     ic_json_data = json_data["IC"].values()
     ncount = 0
     ics = []
+    table = PartTable()
     for dict_design in ic_json_data:
         count = int(dict_design["Count"])
+        part = table.add(dict_design)
+        if compressed:
+            ics.append(IC.view(table, part, ncount, count))
+            ncount += 1
+            continue
         for j in range(count):
-            ics.append(IC(dict_design, ncount + j))
+            ics.append(IC.view(table, part, ncount + j))
         ncount += count
     json_data.pop("IC")
     non_ics = parse_non_ics(json_data, ncount)
     return ics + non_ics
 
+class DesignCoverage:
+    # Units of one design covered by a selection, computed once with an id -> position index:
+    # covered[i] is the number of covered units of ics[i] (repeated ids cover several units of an IC that stands
+    # for several units in compressed designs, capped by its count)
+    def __init__(self, ics, covered_ids):
+        self.ics = ics
+        ids = np.array([ic.id for ic in ics], dtype=np.int64)
+        self.counts = np.array([ic.Count for ic in ics], dtype=np.int64)
+        covered_ids = np.asarray(covered_ids, dtype=np.int64)
+        position = np.full(max(int(ids.max(initial=-1)), int(covered_ids.max(initial=-1))) + 1, -1, dtype=np.int64)
+        position[ids] = np.arange(len(ids))
+        covered_positions = position[covered_ids]
+        self.distinct_covered_ids = len(np.unique(covered_ids))
+        self.covered = np.minimum(np.bincount(covered_positions[covered_positions >= 0], minlength=len(ids)), self.counts)
+        self.name_codes, self.nnames = None, 0 # part names as codes, for the aggregation by name (see summary)
+
+    # covered / not covered ICs, as in the listings of format_results
+    def listing(self, covered):
+        mask = self.covered > 0 if covered else self.covered == 0
+        return "".join(f"    {self.ics[i]}\n" for i in np.flatnonzero(mask).tolist())
+
+    # {name: JSON entry with the number of units} over all ICs, aggregated by part name in order of first appearance
+    def summary(self, unit_counts):
+        if self.name_codes is None:
+            codes = {}
+            self.name_codes = np.array([codes.setdefault(ic.table.columns["Name"][ic.part], len(codes)) for ic in self.ics],
+                                       dtype=np.int64)
+            self.nnames = len(codes)
+        name_codes = self.name_codes
+        present = np.flatnonzero(unit_counts > 0)
+        totals = np.bincount(name_codes[present], weights=unit_counts[present], minlength=self.nnames)
+        # first IC of each name among the ones with units, in order
+        _, first = np.unique(name_codes[present], return_index=True)
+        summary = {}
+        for i in present[np.sort(first)].tolist():
+            ic = self.ics[i]
+            summary[ic.Name] = ic.table.jsondata(ic.part, int(totals[name_codes[i]]))
+        return summary
+
+class SelectionResult:
+    # coverage of both designs by a selection (heuristics and parts selected by their carbon footprint),
+    # the one place results are assembled for all solvers and the UI
+    def __init__(self, selected_heuristics, selected_footprints_a, selected_footprints_b, ics_a, ics_b):
+        covered_a_ids = [aid for h in selected_heuristics for aid in h.parts_a] + list(selected_footprints_a)
+        covered_b_ids = [bid for h in selected_heuristics for bid in h.parts_b] + list(selected_footprints_b)
+        self.coverage_a = DesignCoverage(ics_a, covered_a_ids)
+        self.coverage_b = DesignCoverage(ics_b, covered_b_ids)
+
+    def to_text(self):
+        unmatched_summary = "Unmatched ICs from design A:\n" + self.coverage_a.listing(False)
+        unmatched_summary += "Unmatched ICs from design B:\n" + self.coverage_b.listing(False)
+        covered_parts_A = "Covered parts A:\n" + self.coverage_a.listing(True)
+        covered_parts_B = "Covered parts B:\n" + self.coverage_b.listing(True)
+        return unmatched_summary, covered_parts_A, covered_parts_B, \
+            (self.coverage_a.distinct_covered_ids, self.coverage_b.distinct_covered_ids)
+
+    def to_json(self):
+        a, b = self.coverage_a, self.coverage_b
+        return {"IC": a.summary(a.covered)}, {"IC": b.summary(b.covered)}, \
+            {"IC": a.summary(a.counts - a.covered)}, {"IC": b.summary(b.counts - b.covered)}
+
 def format_results(selected_heuristics, selected_footprints_a, selected_footprints_b, ics_a, ics_b):
-    unmatched_summary = "Unmatched ICs from design A:\n"
-    covered_parts_A = "Covered parts A:\n"
-    covered_a_ids = set([aid for h in selected_heuristics for aid in h.parts_a]+selected_footprints_a)
-    for ic_a in ics_a:
-        if ic_a.id not in covered_a_ids:
-            unmatched_summary += f"    {ic_a}\n"
-        else:
-            covered_parts_A += f"    {ic_a}\n"
-    unmatched_summary += "Unmatched ICs from design B:\n"
-    covered_parts_B = "Covered parts B:\n"
-    covered_b_ids = set([bid for h in selected_heuristics for bid in h.parts_b]+selected_footprints_b)
-    for ic_b in ics_b:
-        if ic_b.id not in covered_b_ids:
-            unmatched_summary += f"    {ic_b}\n"
-        else:
-            covered_parts_B += f"    {ic_b}\n"
-    return unmatched_summary, covered_parts_A, covered_parts_B, (len(covered_a_ids), len(covered_b_ids))
+    return SelectionResult(selected_heuristics, selected_footprints_a, selected_footprints_b, ics_a, ics_b).to_text()
 
 def format_results_to_json(selected_heuristics, selected_footprints_a, selected_footprints_b, ics_a, ics_b):
-    matched_A, matched_B, UNmatched_A, UNmatched_B = {}, {}, {}, {}
-    covered_a_ids = [aid for h in selected_heuristics for aid in h.parts_a]+selected_footprints_a
-    for ic_a in ics_a:
-        if ic_a.id not in covered_a_ids:
-            if ic_a.Name not in UNmatched_A:
-                UNmatched_A[ic_a.Name] = ic_a.jsondata.copy()
-            else:
-                UNmatched_A[ic_a.Name]["Count"] += 1
-    for covered_a_id in covered_a_ids:
-        for ic_a in ics_a:
-            if covered_a_id == ic_a.id:
-                if ic_a.Name not in matched_A:
-                    matched_A[ic_a.Name] = ic_a.jsondata.copy()
-                else:
-                    matched_A[ic_a.Name]["Count"] += 1
-                break
-    covered_b_ids = [bid for h in selected_heuristics for bid in h.parts_b]+selected_footprints_b
-    covered_b_ids_set = set(covered_b_ids)
-    for ic_b in ics_b:
-        if ic_b.id not in covered_b_ids_set:
-            if ic_b.Name not in UNmatched_B:
-                UNmatched_B[ic_b.Name] = ic_b.jsondata.copy()
-            else:
-                UNmatched_B[ic_b.Name]["Count"] += 1
-    track_set = set()
-    for covered_b_id in covered_b_ids:
-        if covered_b_id in track_set:
-            continue
-        track_set.add(covered_b_id)
-        for ic_b in ics_b:
-            if covered_b_id == ic_b.id:
-                if ic_b.Name not in matched_B:
-                    matched_B[ic_b.Name] = ic_b.jsondata.copy()
-                else:
-                    matched_B[ic_b.Name]["Count"] += 1
-    return {"IC": matched_A}, {"IC": matched_B}, {"IC": UNmatched_A}, {"IC": UNmatched_B}
+    return SelectionResult(selected_heuristics, selected_footprints_a, selected_footprints_b, ics_a, ics_b).to_json()
@@ -4,13 +4,19 @@ from tkinter import filedialog as fd
 import tkinter.messagebox
 import customtkinter
 import json
+import logging
 import argparse
 import os
 
 import sys
 sys.path.insert(0, "../sec_6_comparative_impact_assessment") # ugly for now
-from compare import ComparativeLCA, Options
+from compare import Options
 from classes import A_MORE, B_MORE, NOT_SURE
+from user_rules import RuleSyntaxError
+from solver_worker import SolverWorker
+from virtual_list import ComponentItem, ComponentList, TreeviewRows
+
+SOLVER_POLL_MS = 50 # how often the Tk main loop picks up the messages of the solver worker
 
 customtkinter.set_appearance_mode("Dark")  # Modes: "Dark", "Light"
 customtkinter.set_default_color_theme("blue")  # Themes: "blue" (standard), "green", "dark-blue"
@@ -68,13 +74,15 @@ class App(customtkinter.CTk):
         self.design_B_UN = None
         self.design_A_matched = None
         self.design_B_matched = None
-        self.compare_backend = None
+        self.solver_worker = SolverWorker() # comparisons run in the background, see solver_worker
         self.should_refresh_backend = False
         self.backend_options = Options()
         self.user_added_rules = []
 
         # initialize table and data if there's any
         self.setup_tables()
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.after(SOLVER_POLL_MS, self.poll_solver)
         if self.design_A and self.design_B:
             self.design_A_timestamp = os.path.getmtime(self.design_A)
             self.design_B_timestamp = os.path.getmtime(self.design_B)
@@ -83,98 +91,25 @@ class App(customtkinter.CTk):
             self.update_button_action()
 
     def load_data_to_table(self):
-        # Clear existing data in the tables
-        for table in [self.matched_components_table, self.UNmatched_components_table]:
-            table.delete(*table.get_children())
-
-        # Insert matched components into the matched_components_table
-        nmA = len(self.design_A_matched["IC"])
-        nmB = len(self.design_B_matched["IC"])
-        itemsA = list(self.design_A_matched["IC"].items())
-        itemsB = list(self.design_B_matched["IC"].items())
-        for i in range(max(nmA, nmB)):
-            name_package_a = f"{itemsA[i][1]['Name']} ({itemsA[i][1]['Package']})" if i < nmA else ""
-            name_package_b = f"{itemsB[i][1]['Name']} ({itemsB[i][1]['Package']})" if i < nmB else ""
-            self.matched_components_table.insert("", "end", values=(name_package_a, name_package_b))
-
-        # Insert unmatched components into the unmatched_components_table
-        nuA = len(self.design_A_UN["IC"])
-        nuB = len(self.design_B_UN["IC"])
-        itemsA = list(self.design_A_UN["IC"].items())
-        itemsB = list(self.design_B_UN["IC"].items())
-        for i in range(max(nuA, nuB)):
-            name_package_a = f"{itemsA[i][1]['Name']} ({itemsA[i][1]['Package']})" if i < nuA else ""
-            name_package_b = f"{itemsB[i][1]['Name']} ({itemsB[i][1]['Package']})" if i < nuB else ""
-            self.UNmatched_components_table.insert("", "end", values=(name_package_a, name_package_b))
-        
+        # only the rows that changed since the last results are rewritten, see virtual_list.TreeviewRows
+        def rows(design_A, design_B):
+            itemsA = list(design_A["IC"].values())
+            itemsB = list(design_B["IC"].values())
+            return [(f"{itemsA[i]['Name']} ({itemsA[i]['Package']})" if i < len(itemsA) else "",
+                     f"{itemsB[i]['Name']} ({itemsB[i]['Package']})" if i < len(itemsB) else "")
+                    for i in range(max(len(itemsA), len(itemsB)))]
+        self.matched_components_rows.update(rows(self.design_A_matched, self.design_B_matched))
+        self.UNmatched_components_rows.update(rows(self.design_A_UN, self.design_B_UN))
+
     def load_data_to_ScrollableFrame(self):
-        for widget in self.A_scrollable_frame.winfo_children():
-            widget.destroy()
-        for widget in self.B_scrollable_frame.winfo_children():
-            widget.destroy()
-        self.A_scrollable_frame_checkBoxes = []
-        self.A_scrollable_frame_optionMenus = []
-        self.B_scrollable_frame_checkBoxes = []
-        self.B_scrollable_frame_optionMenus = []
-
-        # Iterate over the matched components data to create widgets
-        i = 0
-        for a_ic_name, a_ic_info in self.design_A_UN["IC"].items():
-            # Determine the values for CTkOptionMenu based on the component count
-            count = a_ic_info["Count"]
-            option_menu_values = [str(i) for i in range(count + 1)]  # Generates a list from 0 to count
-
-            # Add CTkOptionMenu on the left with the determined values
-            option_menu = customtkinter.CTkOptionMenu(master=self.A_scrollable_frame,
-                                                    values=option_menu_values)
-            option_menu.grid(row=i, column=0, pady=10, sticky="w")
-            self.A_scrollable_frame_optionMenus.append(option_menu)
-
-            # Add CTkCheckBox on the right with the component name
-            has_carbonfootprint = "Carbon_Footprint" in a_ic_info and a_ic_info["Carbon_Footprint"] is not None
-            checkbox = customtkinter.CTkCheckBox(master=self.A_scrollable_frame, hover_color = "orange", border_color = "orange",
-                                                 text=a_ic_info["Name"], text_color="#b2df8a" if has_carbonfootprint else "#ffffff")  # Use the actual component name
-            checkbox.grid(row=i, column=1, padx=10, pady=0, sticky="w")
-            self.A_scrollable_frame_checkBoxes.append(checkbox)
-            i += 1
-
-        for a_ic_name, a_ic_info in self.design_A_matched["IC"].items():
-            count = a_ic_info["Count"]
-            option_menu_values = [str(i) for i in range(count + 1)]
-            option_menu = customtkinter.CTkOptionMenu(master=self.A_scrollable_frame, values=option_menu_values)
-            option_menu.grid(row=i, column=0, pady=10, sticky="w")
-            self.A_scrollable_frame_optionMenus.append(option_menu)
-            has_carbonfootprint = "Carbon_Footprint" in a_ic_info and a_ic_info["Carbon_Footprint"] is not None
-            checkbox = customtkinter.CTkCheckBox(master=self.A_scrollable_frame, text=a_ic_info["Name"], text_color="#b2df8a" if has_carbonfootprint else "#ffffff")
-            checkbox.grid(row=i, column=1, padx=10, pady=0, sticky="w")
-            self.A_scrollable_frame_checkBoxes.append(checkbox)
-            i += 1
-
-        j = 0
-        for b_ic_name, b_ic_info in self.design_B_UN["IC"].items():
-            count = b_ic_info["Count"]
-            option_menu_values = [str(i) for i in range(count + 1)]
-            option_menu = customtkinter.CTkOptionMenu(master=self.B_scrollable_frame, values=option_menu_values)
-            option_menu.grid(row=j, column=0, pady=10, sticky="w")
-            self.B_scrollable_frame_optionMenus.append(option_menu)
-            has_carbonfootprint = "Carbon_Footprint" in b_ic_info and b_ic_info["Carbon_Footprint"] is not None
-            checkbox = customtkinter.CTkCheckBox(master=self.B_scrollable_frame, hover_color = "orange", border_color = "orange",
-                                                 text=b_ic_info["Name"], text_color="#b2df8a" if has_carbonfootprint else "#ffffff")
-            checkbox.grid(row=j, column=1, padx=10, pady=0, sticky="w")
-            self.B_scrollable_frame_checkBoxes.append(checkbox)
-            j += 1
-
-        for b_ic_name, b_ic_info in self.design_B_matched["IC"].items():
-            count = b_ic_info["Count"]
-            option_menu_values = [str(i) for i in range(count + 1)]
-            option_menu = customtkinter.CTkOptionMenu(master=self.B_scrollable_frame, values=option_menu_values)
-            option_menu.grid(row=j, column=0, pady=10, sticky="w")
-            self.B_scrollable_frame_optionMenus.append(option_menu)
-            has_carbonfootprint = "Carbon_Footprint" in b_ic_info and b_ic_info["Carbon_Footprint"] is not None
-            checkbox = customtkinter.CTkCheckBox(master=self.B_scrollable_frame, text=b_ic_info["Name"], text_color="#b2df8a" if has_carbonfootprint else "#ffffff")
-            checkbox.grid(row=j, column=1, padx=10, pady=0, sticky="w")
-            self.B_scrollable_frame_checkBoxes.append(checkbox)
-            j += 1
+        # unmatched components first, then the matched ones; the lists only create widgets for the visible rows
+        def items(design_UN, design_matched):
+            return [ComponentItem(ic_info["Name"], ic_info["Count"],
+                                  "Carbon_Footprint" in ic_info and ic_info["Carbon_Footprint"] is not None, matched)
+                    for design, matched in [(design_UN, False), (design_matched, True)]
+                    for ic_info in design["IC"].values()]
+        self.A_component_list.set_items(items(self.design_A_UN, self.design_A_matched))
+        self.B_component_list.set_items(items(self.design_B_UN, self.design_B_matched))
 
     def setup_tables(self):
         # Top Left Table
@@ -194,6 +129,7 @@ class App(customtkinter.CTk):
         self.matched_components_table.heading("Design A", text="Design A: Device (Package)", anchor=tk.CENTER)
         self.matched_components_table.heading("Design B", text="Design B: Device (Package)", anchor=tk.CENTER)
         self.matched_components_table.grid(row=0, column=0, sticky="nsew")
+        self.matched_components_rows = TreeviewRows(self.matched_components_table)
 
         # Bottom Left Table
         # Unmatched Components Table Title
@@ -211,10 +147,14 @@ class App(customtkinter.CTk):
         self.UNmatched_components_table.heading("Design A", text="Design A: Device (Package)", anchor=tk.CENTER)
         self.UNmatched_components_table.heading("Design B", text="Design B: Device (Package)", anchor=tk.CENTER)
         self.UNmatched_components_table.grid(row=0, column=0, sticky="nsew")
+        self.UNmatched_components_rows = TreeviewRows(self.UNmatched_components_table)
 
         # Update Button
         self.update_button = customtkinter.CTkButton(self, text="Update", command=self.update_button_action)
         self.update_button.grid(row=4, column=1, pady=10, padx=10, sticky="ew")
+        # progress of the running comparison
+        self.status_label = customtkinter.CTkLabel(self, text="", anchor="w")
+        self.status_label.grid(row=4, column=2, pady=10, padx=10, sticky="w")
 
         # Create and configure the comparator option menu
         self.comparator_frame = customtkinter.CTkFrame(self)
@@ -227,15 +167,11 @@ class App(customtkinter.CTk):
         # Adjust the font size for the option menu values
         self.comparator_option_menu.configure(font=("Roboto", 20))  # Change the font and size as desired
 
-        # Create the CTkScrollableFrame for Design A & B Components
-        self.A_scrollable_frame = customtkinter.CTkScrollableFrame(self, label_text="Design A Components")
-        self.A_scrollable_frame.grid(row=1, column=2, sticky="nsew", padx=10, pady=10)
-        self.A_scrollable_frame_optionMenus = []
-        self.A_scrollable_frame_checkBoxes = []
-        self.B_scrollable_frame = customtkinter.CTkScrollableFrame(self, label_text="Design B Components")
-        self.B_scrollable_frame.grid(row=1, column=4, sticky="nsew", padx=10, pady=10)
-        self.B_scrollable_frame_optionMenus = []
-        self.B_scrollable_frame_checkBoxes = []
+        # Create the scrollable lists for Design A & B Components
+        self.A_component_list = ComponentList(self, label_text="Design A Components")
+        self.A_component_list.grid(row=1, column=2, sticky="nsew", padx=10, pady=10)
+        self.B_component_list = ComponentList(self, label_text="Design B Components")
+        self.B_component_list.grid(row=1, column=4, sticky="nsew", padx=10, pady=10)
 
         # # Add subtitles for "Quantity" and "Device"
         # subtitle_quantity = tk.Label(self.A_scrollable_frame, text="Quantity", anchor="w")
@@ -274,10 +210,6 @@ class App(customtkinter.CTk):
         self.UNmatched_components_frame.grid_columnconfigure(0, weight=1)
         self.user_added_rules_frame.grid_rowconfigure(0, weight=1)
         self.user_added_rules_frame.grid_columnconfigure(0, weight=1)
-        self.A_scrollable_frame.grid_rowconfigure(0, weight=1)
-        self.A_scrollable_frame.grid_columnconfigure(0, weight=1)
-        self.B_scrollable_frame.grid_rowconfigure(0, weight=1)
-        self.B_scrollable_frame.grid_columnconfigure(0, weight=1)
 
     def change_appearance_mode_event(self, new_appearance_mode: str):
         customtkinter.set_appearance_mode(new_appearance_mode)
@@ -323,18 +255,46 @@ class App(customtkinter.CTk):
     def update_button_action(self):
         print("Update button click")
         if self.design_A and self.design_B:
-            if self.compare_backend is None or self.should_refresh_backend:
-                self.compare_backend = ComparativeLCA(self.design_A, self.design_B) #use_v2=False
-                self.should_refresh_backend = False
             # gather user rules
             user_rules = []
             for child in self.user_added_rules_table.get_children():
                 user_rules.append(self.user_added_rules_table.item(child)["values"])
-            self.compare_backend.user_heuristic_rules = user_rules
             print(user_rules)
-            self.design_A_matched, self.design_B_matched, self.design_A_UN, self.design_B_UN = self.compare_backend.run(self.backend_options)
+            # a comparison still running for an older state is cancelled
+            self.solver_worker.submit(self.design_A, self.design_B, user_rules, self.backend_options,
+                                      refresh=self.should_refresh_backend)
+            self.should_refresh_backend = False
+            self.status_label.configure(text="Comparing...")
+
+    # the rules changed while a comparison was running: its result is outdated, compare the latest rules instead
+    def rules_changed(self):
+        if self.solver_worker.busy:
+            self.update_button_action()
+
+    def poll_solver(self):
+        self.solver_worker.poll(self.solver_message)
+        self.after(SOLVER_POLL_MS, self.poll_solver)
+
+    def solver_message(self, kind, job_id, payload):
+        if kind == "progress":
+            self.status_label.configure(text=f"Comparing... ({payload})")
+        elif kind == "result":
+            self.design_A_matched, self.design_B_matched, self.design_A_UN, self.design_B_UN = payload
             self.load_data_to_ScrollableFrame()
             self.load_data_to_table()
+            self.status_label.configure(text="")
+        elif kind == "cancelled":
+            self.status_label.configure(text="Cancelled")
+        elif isinstance(payload, RuleSyntaxError):
+            self.status_label.configure(text="Invalid rule")
+            tkinter.messagebox.showerror("Invalid rule", str(payload))
+        else:
+            self.status_label.configure(text="Comparison failed")
+            tkinter.messagebox.showerror("Comparison failed", str(payload))
+
+    def on_closing(self):
+        self.solver_worker.close()
+        self.destroy()
 
     def comparator_menu_callback(self, comparator):
         curr_prove_direction = A_MORE if comparator == ">=" else B_MORE if comparator == "<=" else NOT_SURE
@@ -349,6 +309,7 @@ class App(customtkinter.CTk):
         if selected_item:
             self.user_added_rules_table.delete(selected_item)
             print(f"Deleted rule: {selected_item}")
+            self.rules_changed()
 
     def add_rules_event(self):
         # Initialize an empty list to store the rules
@@ -356,25 +317,11 @@ class App(customtkinter.CTk):
         a_side_rules = []
         b_side_rules = []
 
-        # Iterate over the components of Design A
-        for a_menu, a_checkbox in zip(self.A_scrollable_frame_optionMenus, self.A_scrollable_frame_checkBoxes):
-            # Check if the checkbox is checked and option menu value is >= 1
-            if a_checkbox.get() and int(a_menu.get()) >= 1:
-                # Format the rule part for Design A and add to the list
-                a_side_rule = f"{a_menu.get()} x {a_checkbox.cget('text')}"
-                a_side_rules.append(a_side_rule)
-                a_checkbox.toggle()
-                a_menu.set("0")
-
-        # Iterate over the components of Design B
-        for b_menu, b_checkbox in zip(self.B_scrollable_frame_optionMenus, self.B_scrollable_frame_checkBoxes):
-            # Check if the checkbox is checked and option menu value is >= 1
-            if b_checkbox.get() and int(b_menu.get()) >= 1:
-                # Format the rule part for Design B and add to the list
-                b_side_rule = f"{b_menu.get()} x {b_checkbox.cget('text')}"
-                b_side_rules.append(b_side_rule)
-                b_checkbox.toggle()
-                b_menu.set("0")
+        # Components of Design A and B that are checked with a quantity >= 1 (their choice is reset)
+        for quantity, name in self.A_component_list.take_selection():
+            a_side_rules.append(f"{quantity} x {name}")
+        for quantity, name in self.B_component_list.take_selection():
+            b_side_rules.append(f"{quantity} x {name}")
 
         # Combine the rules from both sides with the comparator in between
         if a_side_rules and b_side_rules:
@@ -384,6 +331,7 @@ class App(customtkinter.CTk):
             full_rule = f"{' + '.join(a_side_rules)} {comparator} {' + '.join(b_side_rules)}"
             # Insert the full rule into the user added rules table
             self.user_added_rules_table.insert("", "end", values=(full_rule,))
+            self.rules_changed()
 
 
 if __name__ == "__main__":
@@ -392,7 +340,9 @@ if __name__ == "__main__":
     parser.add_argument("--example_folder", type=str, default="../sec_6_comparative_impact_assessment/toy_examples")
     parser.add_argument("--design_A", type=str, default="Arduino_Leonardo_Rev3d.json")
     parser.add_argument("--design_B", type=str, default="Arduino_MKR_Fox_1200.json")
+    parser.add_argument("--log_level", type=str, default="INFO")
     args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format="%(message)s")
 
     app = App(design_A=os.path.join(args.example_folder, args.design_A), design_B=os.path.join(args.example_folder, args.design_B))
     app.mainloop()
@@ -0,0 +1,130 @@
+import copy
+import queue
+import logging
+import threading
+
+from compare import ComparativeLCA
+from cancellation import CancelToken, Cancelled
+from user_rules import RuleSyntaxError
+
+logger = logging.getLogger(__name__)
+
+# one comparison submitted by the UI: the design files, a snapshot of the user rules and of the options
+class ComparisonJob:
+    def __init__(self, job_id, design_A, design_B, user_rules, options):
+        self.id = job_id
+        self.design_A = design_A
+        self.design_B = design_B
+        self.user_rules = user_rules
+        self.options = options
+        self.token = CancelToken()
+
+# Runs the comparisons of the UI on a background thread, so the Tk main loop never waits for a solve.
+# Only the latest state is solved: submit() replaces a job that is still waiting and cancels the one that is running
+# (the solver is interrupted, see cancellation). The ComparativeLCA backend lives on the worker thread and is kept
+# between jobs, so its solver session stays warm.
+# The worker posts (kind, job id, payload) messages, kind being "progress" (phase name), "result"
+# ((matched_A, matched_B, UNmatched_A, UNmatched_B)), "cancelled" or "error" (the exception); poll() hands them to
+# the UI from the Tk main loop, e.g. from an after() callback.
+class SolverWorker:
+    def __init__(self):
+        self.messages = queue.Queue()
+        self.latest_id = None # id of the last submitted job, messages of older jobs are dropped by poll()
+        self.backend = None # ComparativeLCA, only used from the worker thread
+        self._design_version = 0 # incremented when the design files change
+        self._backend_key = None # (design files, design version) of the backend
+        self._condition = threading.Condition()
+        self._pending = None
+        self._running = None
+        self._next_id = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="solver_worker", daemon=True)
+        self._thread.start()
+
+    # refresh: the design files changed on disk and are loaded again; returns the id of the new job
+    def submit(self, design_A, design_B, user_rules, options, refresh=False):
+        with self._condition:
+            job = ComparisonJob(self._next_id, design_A, design_B, [list(rule) for rule in user_rules],
+                                copy.copy(options))
+            self._next_id += 1
+            if refresh:
+                self._design_version += 1
+            if self._pending is not None:
+                self.messages.put(("cancelled", self._pending.id, None))
+            if self._running is not None:
+                self._running.token.cancel()
+            self._pending = job
+            self.latest_id = job.id
+            self._condition.notify()
+            return job.id
+
+    # cancels the running and the waiting job
+    def cancel(self):
+        with self._condition:
+            if self._pending is not None:
+                self.messages.put(("cancelled", self._pending.id, None))
+                self._pending = None
+            if self._running is not None:
+                self._running.token.cancel()
+
+    @property
+    def busy(self):
+        with self._condition:
+            return self._pending is not None or self._running is not None
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self.cancel()
+
+    # Hands the messages posted since the last call to handle(kind, job_id, payload), in order.
+    # Messages of jobs older than the last submitted one are dropped and only the last progress message is kept.
+    def poll(self, handle):
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                break
+        messages = [message for message in messages if message[1] == self.latest_id]
+        last_progress = max((i for i, message in enumerate(messages) if message[0] == "progress"), default=None)
+        for i, message in enumerate(messages):
+            if message[0] != "progress" or i == last_progress:
+                handle(*message)
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                job, self._pending = self._pending, None
+                self._running = job
+            try:
+                self.messages.put(("result", job.id, self._run(job)))
+            except Cancelled:
+                self.messages.put(("cancelled", job.id, None))
+            except RuleSyntaxError as e:
+                self.messages.put(("error", job.id, e))
+            except Exception as e:
+                logger.exception("Comparison %d failed", job.id)
+                self.messages.put(("error", job.id, e))
+            finally:
+                with self._condition:
+                    self._running = None
+
+    def _run(self, job):
+        options = job.options
+        options.cancel_token = job.token
+        options.on_progress = lambda phase: self.messages.put(("progress", job.id, phase))
+        with self._condition:
+            key = (job.design_A, job.design_B, self._design_version)
+        if self.backend is None or self._backend_key != key:
+            options.progress("loading")
+            self.backend = None
+            self.backend = ComparativeLCA(job.design_A, job.design_B) #use_v2=False
+            self._backend_key = key
+        self.backend.user_heuristic_rules = job.user_rules
+        return self.backend.run(options)
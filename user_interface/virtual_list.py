@@ -0,0 +1,179 @@
+import sys
+import difflib
+import customtkinter
+
+ROW_HEIGHT = 48 # pixels of a row: option menu and its padding
+MAX_SCROLL_ROWS = 3 # rows scrolled by one step of the mouse wheel
+
+# A component of a design listed in a ComponentList. The check box and quantity chosen by the user are kept here,
+# not in the widgets, which are recycled for other components while scrolling.
+class ComponentItem:
+    def __init__(self, name, count, has_carbonfootprint, matched):
+        self.name = name
+        self.count = count
+        self.has_carbonfootprint = has_carbonfootprint
+        self.matched = matched
+        self.checked = False
+        self.quantity = "0"
+
+    @property
+    def key(self):
+        return (self.matched, self.name)
+
+    # what the widgets of a row show, apart from the user's choice
+    @property
+    def appearance(self):
+        return (self.name, self.count, self.has_carbonfootprint, self.matched)
+
+# the widgets of one visible row: a quantity menu and a check box with the component name
+class ComponentRow:
+    def __init__(self, master, index):
+        self.item = None
+        self.appearance = None
+        self.option_menu = customtkinter.CTkOptionMenu(master=master, values=["0"], command=self.quantity_changed)
+        self.checkbox = customtkinter.CTkCheckBox(master=master, text="", command=self.check_changed)
+        self.layout = [(self.option_menu, dict(row=index, column=0, pady=10, sticky="w")),
+                       (self.checkbox, dict(row=index, column=1, padx=10, pady=0, sticky="w"))]
+        self.visible = False
+
+    def show(self, item):
+        self.item = item
+        if item.appearance != self.appearance:
+            self.appearance = item.appearance
+            theme = customtkinter.ThemeManager.theme["CTkCheckBox"]
+            self.option_menu.configure(values=[str(i) for i in range(item.count + 1)])  # from 0 to count
+            # unmatched components are highlighted, components with a carbon footprint are green
+            self.checkbox.configure(text=item.name, text_color="#b2df8a" if item.has_carbonfootprint else "#ffffff",
+                                    hover_color=theme["hover_color"] if item.matched else "orange",
+                                    border_color=theme["border_color"] if item.matched else "orange")
+        if self.option_menu.get() != item.quantity:
+            self.option_menu.set(item.quantity)
+        if bool(self.checkbox.get()) != item.checked:
+            self.checkbox.select() if item.checked else self.checkbox.deselect()
+
+    def set_visible(self, visible):
+        if visible == self.visible:
+            return
+        self.visible = visible
+        for widget, kwargs in self.layout:
+            widget.grid(**kwargs) if visible else widget.grid_forget()
+
+    def quantity_changed(self, quantity):
+        self.item.quantity = quantity
+
+    def check_changed(self):
+        self.item.checked = bool(self.checkbox.get())
+
+# Scrollable list of ComponentItems that only has widgets for the rows that fit in the window.
+# Scrolling shows other items in the same widgets, and set_items() keeps the choices of the user for the
+# components still listed and only reconfigures rows whose component changed.
+class ComponentList(customtkinter.CTkFrame):
+    def __init__(self, master, label_text):
+        super().__init__(master)
+        self.label = customtkinter.CTkLabel(self, text=label_text)
+        self.label.grid(row=0, column=0, columnspan=2, padx=10, pady=(5, 0), sticky="ew")
+        self.body = customtkinter.CTkFrame(self, fg_color="transparent")
+        self.body.grid(row=1, column=0, sticky="nsew", padx=(10, 0))
+        self.body.grid_columnconfigure(1, weight=1)
+        self.body.grid_propagate(False) # the rows fill the space they are given, they do not ask for more
+        self.scrollbar = customtkinter.CTkScrollbar(self, command=self.scroll)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.items = []
+        self.rows = [] # widget pool, grown to the number of visible rows
+        self.first = 0 # index of the first visible item
+        self.nvisible = 1
+        self.body.bind("<Configure>", self.resized)
+        window = self.winfo_toplevel()
+        window.bind_all("<MouseWheel>", self.mouse_wheel, add="+")
+        window.bind_all("<Button-4>", self.mouse_wheel, add="+") # X11
+        window.bind_all("<Button-5>", self.mouse_wheel, add="+")
+
+    def set_items(self, items):
+        previous = {item.key: item for item in self.items}
+        for item in items:
+            if item.key in previous:
+                item.checked = previous[item.key].checked
+                item.quantity = previous[item.key].quantity
+        self.items = items
+        self.show(self.first)
+
+    # (quantity, name) of the items that are checked with a quantity of at least 1, their choice is reset
+    def take_selection(self):
+        selection = []
+        for item in self.items:
+            if item.checked and int(item.quantity) >= 1:
+                selection.append((item.quantity, item.name))
+                item.checked = False
+                item.quantity = "0"
+        self.show(self.first)
+        return selection
+
+    def show(self, first):
+        self.first = max(0, min(first, len(self.items) - self.nvisible))
+        for k, row in enumerate(self.rows):
+            index = self.first + k
+            if k < self.nvisible and index < len(self.items):
+                row.show(self.items[index])
+                row.set_visible(True)
+            else:
+                row.set_visible(False)
+        if self.items:
+            self.scrollbar.set(self.first / len(self.items), min(1.0, (self.first + self.nvisible) / len(self.items)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def resized(self, event):
+        self.nvisible = max(1, event.height // ROW_HEIGHT)
+        while len(self.rows) < self.nvisible:
+            self.rows.append(ComponentRow(self.body, len(self.rows)))
+        self.show(self.first)
+
+    # scrollbar command: ("moveto", fraction) or ("scroll", number, "units" or "pages")
+    def scroll(self, action, value, unit="units"):
+        if action == "moveto":
+            self.show(round(float(value) * len(self.items)))
+        else:
+            step = self.nvisible if unit == "pages" else 1
+            rows = max(-MAX_SCROLL_ROWS, min(MAX_SCROLL_ROWS, int(value))) * step
+            self.show(self.first + rows)
+
+    def mouse_wheel(self, event):
+        widget = str(event.widget)
+        if widget != str(self) and not widget.startswith(str(self) + "."):
+            return
+        if event.num == 4 or event.num == 5:
+            direction = -1 if event.num == 4 else 1
+        else:
+            direction = -1 if event.delta > 0 else 1
+        self.show(self.first + direction * (1 if sys.platform == "darwin" else MAX_SCROLL_ROWS))
+
+# Rows of a ttk.Treeview that are updated in place: between two updates only the rows that differ
+# (found with difflib) are rewritten, inserted or deleted.
+class TreeviewRows:
+    def __init__(self, table):
+        self.table = table
+        self.ids = []
+        self.rows = []
+
+    def update(self, rows):
+        rows = [tuple(values) for values in rows]
+        ids = []
+        matcher = difflib.SequenceMatcher(None, self.rows, rows, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                ids += self.ids[i1:i2]
+                continue
+            # the old rows i1:i2 become the new rows j1:j2
+            reused = self.ids[i1:i2][:j2 - j1]
+            for item_id, values in zip(reused, rows[j1:j2]):
+                self.table.item(item_id, values=values)
+            ids += reused
+            if i2 - i1 > len(reused):
+                self.table.delete(*self.ids[i1 + len(reused):i2])
+            for values in rows[j1 + len(reused):j2]:
+                ids.append(self.table.insert("", len(ids), values=values))
+        self.ids = ids
+        self.rows = rows